@@ -0,0 +1,336 @@
+"""
+Headless benchmark suite for the single-file prototype in `main.py`.
+
+Drives fixed, seeded scenarios through `main.step()` without opening a window
+and reports simulation throughput in ticks per second. It also reports the
+per-frame cost and GL call count of `display()`, with every GL call swapped
+for a counted no-op (glcount.py). That covers the Python side of rendering;
+driver and GPU time are not included. Then it times bullet-vs-enemy hit
+resolution against the original per-pair loop. Scenarios whose load does
+not last (the level-2 swarm dies on contact with the player) time a shorter
+window, and every scenario checks that the enemies it is meant to measure
+are still alive.
+
+Startup is measured in fresh interpreters: the time to `import main`, to
+bind PyOpenGL (main.bind_gl()), and from the start of the import to the end
+of the first display() of level 1, GL calls again stubbed. The median of
+several runs is reported.
+
+Results can be written to JSON and are checked against a stored baseline
+(bench_baseline.json). A scenario that makes more GL calls per frame or ends
+in a different state hash (it did different work) is reported as a
+regression on any machine. Timings are only comparable on the machine that
+recorded the baseline, which it names: there, a scenario slower than the
+baseline by more than its tolerance is a regression too; elsewhere the
+slowdowns are printed as notes. A regression makes the run exit with status
+1. Re-record the baseline on your own machine with --save-baseline.
+
+Usage: python bench.py [ticks] [--frames N] [--only NAME ...] [--json FILE]
+                       [--baseline FILE] [--save-baseline] [--no-hits]
+                       [--no-startup]
+"""
+
+import argparse, hashlib, json, math, os, platform, random, subprocess, sys, time
+
+import font
+import main as game
+from glcount import GLCounter
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+TOLERANCE = 0.3  # default allowed slowdown, as a fraction of the baseline
+SEED = 1
+
+# a staged level would compete with the timed ticks for the GIL
+game.preload_enabled = False
+game.bind_gl()
+
+# Run in a fresh interpreter by startup_time(); prints the times in ms
+STARTUP_SCRIPT = '''
+import json, time
+t0 = time.perf_counter()
+import main as game
+t1 = time.perf_counter()
+game.bind_gl()
+t2 = time.perf_counter()
+import font
+from glcount import GLCounter
+game.preload_enabled = False
+w = game.World(1)
+game.setup_level(w, 1)
+with GLCounter(game, font):
+    game.display(w)
+print(json.dumps({'import_ms': (t1 - t0) * 1e3, 'bind_gl_ms': (t2 - t1) * 1e3,
+                  'first_frame_ms': (time.perf_counter() - t0) * 1e3}))
+'''
+
+
+def walk(i):
+    # Standard input script: walk, turn now and then, fire every 15 ticks
+    return {'w': i % 120 < 90, 'd': i % 240 >= 200, 'fire': i % 15 == 0}
+
+
+def walking(w):
+    return walk
+
+
+def spring(*triggers):
+    # Step on the golden tile of each trigger in turn to set off its trap
+    def prepare(w):
+        for name in triggers:
+            t = next(t for t in w.golden_tiles if t.trigger == name)
+            game.place_player(w, t.x, t.y)
+            game.animate(w)
+    return prepare
+
+
+def add_enemies(n, seed=7):
+    # n normal enemies scattered over the arena
+    def prepare(w):
+        rng = random.Random(seed)
+        wb = w.world_bounds
+        for _ in range(n):
+            x = rng.uniform(wb['min_x'], wb['max_x']); y = rng.uniform(wb['min_y'], wb['max_y'])
+            w.add_enemy(game.Enemy(x, y, game.GRID_Z, rng=rng))
+    return prepare
+
+
+def bullet_storm(per_tick):
+    # walk() that also fires per_tick bullets in a turning ring around the
+    # player every tick; at handgun speed and range about 50*per_tick are live
+    def make(w):
+        def inputs(i):
+            p = w.player
+            for k in range(per_tick):
+                a = 2*math.pi * (k + i*0.37) / per_tick
+                w.bullets.spawn(p.x, p.y, p.z, 16*math.cos(a), 16*math.sin(a), p.damage)
+            return walk(i)
+        return inputs
+    return make
+
+
+# name -> (level, prepare(w) after setup_level or None, inputs(w) -> step() inputs,
+#          ticks timed or None for the command-line count, enemies that must be alive
+#          when the ticks are timed and the frame is rendered)
+# A scenario with its own tick count times only the window in which its load
+# exists, and renders its frame right after prepare
+SCENARIOS = {
+    'level1': (1, None, walking, None, 0),
+    'level2': (2, None, walking, None, 0),
+    'level3': (3, None, walking, None, 0),
+    'level1_traps': (1, spring('rifle_trap', 'turret_trap'), walking, None, 10),  # 10 enemies + 3 turrets
+    # 14 fast enemies reach the player, and are removed on contact, after ~90 ticks
+    'level2_swarm': (2, spring('fast_trap'), walking, 80, 12),
+    'enemies_100': (3, add_enemies(100), walking, None, 90),
+    'enemies_1000': (3, add_enemies(1000), walking, None, 900),
+    'bullets_1000': (3, add_enemies(100), bullet_storm(20), None, 50),
+}
+
+
+def check_enemies(name, w, when):
+    # Fail loudly if the scenario lost the load it is meant to measure
+    need = SCENARIOS[name][4]
+    if len(w.enemies) < need:
+        raise RuntimeError(f"{name}: {len(w.enemies)} enemies alive {when}, the scenario needs {need}")
+
+
+def start(name):
+    # A fresh seeded world playing the scenario; returns it and its inputs
+    level, prepare, inputs = SCENARIOS[name][:3]
+    w = game.World(SEED)
+    game.setup_level(w, level)
+    w.paused = False; w.menu_mode = None
+    if prepare:
+        prepare(w)
+    # keep the player alive so every run lasts the full tick count
+    w.player.health = 10**9
+    return w, inputs(w)
+
+
+def frame_time(w, frames):
+    # Median seconds per display() of the world and the GL calls per frame,
+    # after one warm-up frame that compiles the static layer and HUD
+    # widgets. GL calls are counted no-ops (see glcount.py)
+    game.camera_mode = game.cam_third; game.cam_eye = None; game.cam_cen = None
+    times = []
+    with GLCounter(game, font) as gl:
+        game.display(w)
+        gl.reset()
+        for _ in range(frames):
+            t0 = time.perf_counter()
+            game.display(w)
+            times.append(time.perf_counter() - t0)
+        return sorted(times)[frames // 2], gl.total() // frames
+
+
+def run_scenario(name, n_ticks, frames, repeats=3):
+    # Best of seeded runs, so one-off stalls do not count. A short tick
+    # window gets more runs, for about as many timed ticks as a full one
+    window = SCENARIOS[name][3]
+    if window:
+        repeats = max(repeats, repeats * n_ticks // window)
+        n_ticks = min(n_ticks, window)
+    best = math.inf
+    for _ in range(repeats):
+        w, inputs = start(name)
+        t0 = time.perf_counter()
+        ran = game.step(w, n_ticks, inputs)
+        best = min(best, (time.perf_counter() - t0) / ran)
+        check_enemies(name, w, f"after {ran} ticks")
+    if window:
+        frame_w = start(name)[0]
+        check_enemies(name, frame_w, "when the frame is rendered")
+    else:
+        frame_w = w
+    frame_s, gl_calls = frame_time(frame_w, frames)
+    return {'ticks': ran, 'ticks_per_s': round(1 / best, 1),
+            'frame_ms': round(frame_s * 1e3, 4), 'gl_calls': gl_calls,
+            'enemies': len(w.enemies), 'bullets': len(w.bullets),
+            'state': f"{game.state_hash(w):08x}"}
+
+
+def startup_time(runs=5):
+    # Median startup times over `runs` fresh interpreters
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = [json.loads(subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=here, check=True,
+                                         capture_output=True, text=True).stdout.splitlines()[-1])
+               for _ in range(runs)]
+    return {k: round(sorted(s[k] for s in samples)[runs // 2], 1) for k in samples[0]}
+
+
+def machine():
+    # Names the machine and interpreter timings were taken on; the host name
+    # is hashed so a committed baseline does not carry it
+    host = hashlib.sha1(platform.node().encode()).hexdigest()[:8]
+    return (f"{platform.system()} {platform.machine()} {platform.processor() or '?'}, "
+            f"{os.cpu_count()} CPUs, Python {platform.python_version()}, host {host}")
+
+
+def compare(results, baseline):
+    # (regressions, notes) for results against a baseline dict. State hashes
+    # and GL call counts do not depend on the machine; timings only count as
+    # regressions on the machine that recorded the baseline
+    failures, notes = [], []
+    if baseline.get('ticks') not in (None, results['ticks']):
+        failures.append(f"baseline was recorded with {baseline['ticks']} ticks, this run used {results['ticks']}")
+        return failures, notes
+    slow = failures if baseline.get('machine') == results['machine'] else notes
+    for name, r in results['scenarios'].items():
+        b = baseline['scenarios'].get(name)
+        if b is None:
+            continue
+        tol = b.get('tolerance', baseline.get('tolerance', TOLERANCE))
+        if r['state'] != b['state']:
+            failures.append(f"{name}: final state {r['state']} != baseline {b['state']} (different work, timings not comparable)")
+        if r['ticks_per_s'] < b['ticks_per_s'] * (1 - tol):
+            slow.append(f"{name}: {r['ticks_per_s']:.0f} ticks/s vs baseline {b['ticks_per_s']:.0f} (-{tol:.0%} allowed)")
+        if r['frame_ms'] > b['frame_ms'] * (1 + tol):
+            slow.append(f"{name}: display() {r['frame_ms']:.3f} ms vs baseline {b['frame_ms']:.3f} (+{tol:.0%} allowed)")
+        # call counts are exact, so any increase is a regression
+        if r['gl_calls'] > b.get('gl_calls', r['gl_calls']):
+            failures.append(f"{name}: {r['gl_calls']} GL calls per frame vs baseline {b['gl_calls']}")
+    tol = baseline.get('tolerance', TOLERANCE)
+    for k, ms in results.get('startup', {}).items():
+        b = baseline.get('startup', {}).get(k)
+        if b is not None and ms > b * (1 + tol):
+            slow.append(f"startup {k} {ms:.1f} vs baseline {b:.1f} (+{tol:.0%} allowed)")
+    return failures, notes
+
+
+def reference_bullet_hits(w):
+    # The nested per-pair loop that resolve_bullet_hits() replaced
+    bullets, enemies = w.bullets, w.enemies
+    for i in bullets.live().tolist():
+        bx, by = bullets.x[i], bullets.y[i]
+        for e in list(enemies):
+            if math.hypot(bx - e.x, by - e.y) < e.hit_radius:
+                if e.hit_by_bullet(float(bullets.dmg[i])) == 'defeated':
+                    w.remove_enemy(e)
+                    game.enemy_defeated(w, e)
+                bullets.kill([i])
+                break
+
+
+def hit_resolution_time(resolve, n, reps=5, seed=1):
+    # n bullets against n enemies scattered over a level-3 sized arena
+    rng = random.Random(seed)
+    w = game.World(seed)
+    game.setup_level(w, 2)
+    enemies = [game.Enemy(rng.uniform(-1600, 1600), rng.uniform(-1600, 1600), game.GRID_Z) for _ in range(n)]
+    shots = [(rng.uniform(-1600, 1600), rng.uniform(-1600, 1600)) for _ in range(n)]
+    total = 0.0
+    for _ in range(reps):
+        game.clear_level(w)
+        for e in enemies:
+            e.hp = 20
+            w.add_enemy(e)
+        for x, y in shots:
+            w.bullets.spawn(x, y, 50, 0, 0, 10)
+        t0 = time.perf_counter()
+        resolve(w)
+        total += time.perf_counter() - t0
+    return total / reps
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Headless simulation and render benchmarks")
+    ap.add_argument('ticks', nargs='?', type=int, default=600, help="ticks per scenario run")
+    ap.add_argument('--frames', type=int, default=30, help="display() calls timed per scenario")
+    ap.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), help="run just these scenarios")
+    ap.add_argument('--json', help="write the results to this file")
+    ap.add_argument('--baseline', default=BASELINE, help="baseline to compare against")
+    ap.add_argument('--save-baseline', action='store_true', help="record these results as the baseline")
+    ap.add_argument('--no-hits', action='store_true', help="skip the hit resolution comparison")
+    ap.add_argument('--no-startup', action='store_true', help="skip the startup timing")
+    args = ap.parse_args()
+
+    results = {'ticks': args.ticks, 'frames': args.frames, 'seed': SEED, 'machine': machine(), 'scenarios': {}}
+    print(f"{'scenario':14s} {'ticks/s':>10s} {'frame ms':>9s} {'GL calls':>9s} {'enemies':>8s} {'bullets':>8s}  state")
+    for name in args.only or SCENARIOS:
+        r = results['scenarios'][name] = run_scenario(name, args.ticks, args.frames)
+        print(f"{name:14s} {r['ticks_per_s']:10.0f} {r['frame_ms']:9.3f} {r['gl_calls']:9d} {r['enemies']:8d} {r['bullets']:8d}  {r['state']}")
+    if not args.no_startup:
+        s = results['startup'] = startup_time()
+        print(f"Startup: import main {s['import_ms']:.0f} ms, bind_gl {s['bind_gl_ms']:.0f} ms, "
+              f"first frame {s['first_frame_ms']:.0f} ms after import")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if args.save_baseline:
+        old = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                old = json.load(f)
+        # keep hand-tuned tolerances
+        for name, r in results['scenarios'].items():
+            if 'tolerance' in old.get('scenarios', {}).get(name, {}):
+                r['tolerance'] = old['scenarios'][name]['tolerance']
+        results['tolerance'] = old.get('tolerance', TOLERANCE)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures, notes = compare(results, baseline)
+        if notes:
+            print(f"Baseline timings are from another machine ({baseline.get('machine', 'not recorded')}); "
+                  f"slowdowns are informational. Record your own with --save-baseline")
+        for msg in notes:
+            print(f"NOTE {msg}")
+        for msg in failures:
+            print(f"REGRESSION {msg}", file=sys.stderr)
+        if not failures:
+            print("No regressions against the baseline")
+    else:
+        print(f"No baseline at {args.baseline}; record one with --save-baseline")
+
+    if not args.no_hits:
+        print("Bullet hit resolution (bullets x enemies):")
+        for size in (10, 100, 1000):
+            ref = hit_resolution_time(reference_bullet_hits, size)
+            vec = hit_resolution_time(game.resolve_bullet_hits, size)
+            print(f"  {size:4d} x {size:<4d}  loop {ref*1e3:9.3f} ms  numpy {vec*1e3:8.3f} ms  ({ref/vec:6.1f}x)")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,51 @@
+"""
+Display-list bitmap font for the HUD and menu text in `main.py`.
+
+Each printable ASCII glyph of a GLUT bitmap font is compiled into its own
+display list once, so a whole string is drawn with a single glCallLists over
+its bytes instead of one glutBitmapCharacter call per character. Glyph
+advances are cached as well, for measuring and centring strings.
+
+The GL and GLUT names are bound into this module by `glbind.bind()` (see
+`main.bind_gl()`), so the font is named rather than passed as a GLUT handle.
+"""
+
+
+class BitmapFont:
+    def __init__(self, font, first=32, last=126):
+        self.font = font  # name of a GLUT bitmap font, e.g. 'GLUT_BITMAP_9_BY_15'
+        self.first = first
+        self.count = last - first + 1
+        self.base = None  # first display list id, once built
+        self.widths = []
+
+    def build(self):
+        # Needs a current GL context; safe to call again (no-op once built)
+        if self.base is not None:
+            return
+        font = globals()[self.font]
+        self.base = glGenLists(self.count)
+        for i in range(self.count):
+            glNewList(self.base + i, GL_COMPILE)
+            glutBitmapCharacter(font, self.first + i)
+            glEndList()
+        self.widths = [glutBitmapWidth(font, self.first + i) for i in range(self.count)]
+
+    def encode(self, text):
+        # Glyph codes for text; characters without a glyph become '?'
+        last = self.first + self.count
+        return bytes(c if self.first <= c < last else 63 for c in map(ord, text))
+
+    def width(self, text):
+        # Width of text in pixels
+        self.build()
+        first = self.first
+        return sum(self.widths[c - first] for c in self.encode(text))
+
+    def draw(self, x, y, text):
+        # Draw text with its baseline starting at window pixel (x, y); the
+        # raster position is set in window coordinates, so no projection setup
+        self.build()
+        glWindowPos2f(x, y)
+        glListBase(self.base - self.first)
+        glCallLists(self.encode(text))
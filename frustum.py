@@ -0,0 +1,63 @@
+"""
+View-frustum tests for culling in `main.py`.
+
+A Frustum is built from the same parameters as gluPerspective/gluLookAt and
+tests axis-aligned boxes and spheres against its six planes. Plane normals
+point into the frustum and are unit length, so sphere tests use real distances.
+"""
+
+import math
+
+import numpy as np
+
+
+def _normalize(v):
+    n = math.sqrt(v[0]*v[0] + v[1]*v[1] + v[2]*v[2]) or 1.0
+    return (v[0]/n, v[1]/n, v[2]/n)
+
+
+def _cross(a, b):
+    return (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+
+
+class Frustum:
+    def __init__(self, eye, center, up, fovy, aspect, near, far):
+        f = _normalize((center[0]-eye[0], center[1]-eye[1], center[2]-eye[2]))
+        s = _normalize(_cross(f, up))
+        u = _cross(s, f)
+        ty = math.tan(math.radians(fovy) / 2)
+        tx = ty * aspect
+        normals = [
+            f,                                                   # near
+            (-f[0], -f[1], -f[2]),                               # far
+            _normalize(tuple(f[i]*tx + s[i] for i in range(3))),  # left
+            _normalize(tuple(f[i]*tx - s[i] for i in range(3))),  # right
+            _normalize(tuple(f[i]*ty + u[i] for i in range(3))),  # bottom
+            _normalize(tuple(f[i]*ty - u[i] for i in range(3))),  # top
+        ]
+        points = [tuple(eye[i] + f[i]*near for i in range(3)),
+                  tuple(eye[i] + f[i]*far for i in range(3)),
+                  eye, eye, eye, eye]
+        self.planes = [(n[0], n[1], n[2], -(n[0]*p[0] + n[1]*p[1] + n[2]*p[2]))
+                       for n, p in zip(normals, points)]
+        self.normals = np.array([p[:3] for p in self.planes])
+        self.offsets = np.array([p[3] for p in self.planes])
+
+    def box_visible(self, x0, y0, z0, x1, y1, z1):
+        # Conservative AABB test: False only if the box is fully outside a plane
+        for a, b, c, d in self.planes:
+            # corner furthest along the plane normal
+            if a*(x1 if a > 0 else x0) + b*(y1 if b > 0 else y0) + c*(z1 if c > 0 else z0) + d < 0:
+                return False
+        return True
+
+    def sphere_visible(self, x, y, z, r):
+        for a, b, c, d in self.planes:
+            if a*x + b*y + c*z + d < -r:
+                return False
+        return True
+
+    def spheres_visible(self, centers, r):
+        # Vectorized sphere test for an (n, 3) array of centers; returns a mask
+        dist = centers @ self.normals.T + self.offsets
+        return np.all(dist >= -r, axis=1)
@@ -0,0 +1,38 @@
+"""
+Deferred PyOpenGL bindings for `main.py` and `font.py`.
+
+Those modules call GL, GLU and GLUT functions by their bare names, as a
+`from OpenGL.GL import *` would provide. Importing PyOpenGL takes longer
+than the rest of the game put together, and the simulation never needs it,
+so the star imports are done by bind() instead: it copies the public names
+of the three modules into the given module namespaces. Until then the
+modules import and simulate without PyOpenGL installed.
+"""
+
+GL_MODULES = ('OpenGL.GL', 'OpenGL.GLU', 'OpenGL.GLUT')
+
+_names = None  # public PyOpenGL names, once imported
+
+
+def names():
+    # {name: object} of a star import of GL, GLU and GLUT, imported once
+    global _names
+    if _names is None:
+        import importlib
+        found = {}
+        for module in GL_MODULES:
+            m = importlib.import_module(module)
+            found.update((k, v) for k, v in vars(m).items() if not k.startswith('_'))
+        _names = found
+    return _names
+
+
+def bind(*namespaces):
+    # Star-import GL, GLU and GLUT into each namespace dict. Names the
+    # namespace already defines are left alone, as with a star import
+    # placed before them
+    gl = names()
+    for ns in namespaces:
+        for k, v in gl.items():
+            if k not in ns:
+                ns[k] = v
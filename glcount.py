@@ -0,0 +1,76 @@
+"""
+GL call counting for `main.py`.
+
+The renderer is immediate-mode PyOpenGL, so the number of Python-to-C GL
+calls is most of its cost. GLCounter swaps every gl*/glu*/glut* function in
+the given modules for a wrapper that counts calls per function. By default
+the wrapper does nothing and returns 1, a valid display list id, so
+display() can run without a GL context or GPU. With passthrough=True it
+also calls the real function.
+
+    main.bind_gl()
+    with GLCounter(main, font) as gl:
+        main.display(main.world)
+    gl.counts['glBegin'], gl.total()
+
+end_frame() files the current counts as one frame and starts the next, for
+per-frame numbers over a longer run. test_budgets.py uses this to check
+per-level draw budgets.
+"""
+
+from collections import Counter
+
+
+class GLCounter:
+    def __init__(self, *modules, passthrough=False):
+        self.modules = modules
+        self.passthrough = passthrough
+        self.counts = Counter()  # calls per function in the current frame
+        self.frames = []         # Counter per finished frame
+        self.saved = []
+
+    def _wrap(self, name, fn):
+        counts = self.counts
+        if self.passthrough:
+            def counted(*args, **kwargs):
+                counts[name] += 1
+                return fn(*args, **kwargs)
+        else:
+            def counted(*args, **kwargs):
+                counts[name] += 1
+                return 1
+        return counted
+
+    def install(self):
+        # Replace the GL functions of every module; undone by uninstall()
+        for m in self.modules:
+            for name, fn in list(vars(m).items()):
+                if name.startswith('gl') and callable(fn):
+                    self.saved.append((m, name, fn))
+                    setattr(m, name, self._wrap(name, fn))
+        return self
+
+    def uninstall(self):
+        for m, name, fn in reversed(self.saved):
+            setattr(m, name, fn)
+        self.saved.clear()
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+        return False
+
+    def total(self, counts=None):
+        return sum((self.counts if counts is None else counts).values())
+
+    def reset(self):
+        self.counts.clear()
+
+    def end_frame(self):
+        # File the current counts as a finished frame and start a new one
+        frame = Counter(self.counts)
+        self.frames.append(frame)
+        self.counts.clear()
+        return frame
@@ -0,0 +1,171 @@
+"""
+Level data files for `main.py`.
+
+Each level is described by `levels/level<N>.json`: arena bounds, player
+start, tiles, chests, enemies, obstacles and golden-tile triggers. Random
+placements (keys, chests, enemies) are given as counts and ranges and are
+rolled when the level is set up. Triggers map an id to the message shown
+on the golden tile and optional spawn points; main.py keys the trap
+behaviour on the id.
+
+The first load compiles the JSON into a flat record array plus a string
+table, saved as .npy files under `levels/__cache__/`. Later loads, and
+restarts within one run, memory-map those files instead of parsing the
+JSON again. A cache older than its JSON file, or one that cannot be read,
+is rebuilt. Cache files are written under a temporary name and renamed
+into place, so an interrupted or concurrent build never leaves a truncated
+file behind.
+"""
+
+import json, os, tempfile
+
+import numpy as np
+
+
+LEVEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels')
+CACHE_VERSION = 1
+
+# One record per placement; a and b index the string table (-1 = none)
+RECORD = np.dtype([('kind', 'u1'), ('x', 'f4'), ('y', 'f4'), ('z', 'f4'),
+                   ('w', 'f4'), ('d', 'f4'), ('h', 'f4'), ('a', 'i4'), ('b', 'i4')])
+
+# Record kinds in the order they are replayed; random placements keep the
+# order in which the original setup code drew from the RNG
+KINDS = ('random_keys', 'random_chests', 'bounds', 'player', 'start_message', 'trigger',
+         'trigger_spawn', 'checkpoint', 'lava', 'golden', 'exit', 'portal', 'chest',
+         'obstacle', 'random_enemies', 'enemy', 'keys_per_chest')
+KIND = {name: i for i, name in enumerate(KINDS)}
+
+
+class LevelData:
+    __slots__ = ('records', 'strings')
+
+    def __init__(self, records, strings):
+        self.records = records  # RECORD array, possibly memory-mapped
+        self.strings = strings
+
+    def __iter__(self):
+        # (kind name, x, y, z, w, d, h, a, b) tuples with strings resolved
+        strings = self.strings
+        for k, x, y, z, w, d, h, a, b in self.records.tolist():
+            yield (KINDS[k], x, y, z, w, d, h,
+                   strings[a] if a >= 0 else None, strings[b] if b >= 0 else None)
+
+
+def compile_level(src):
+    # Parsed level JSON -> (records, strings)
+    rows = []
+    strings = []
+    index = {}
+
+    def s(text):
+        if text is None:
+            return -1
+        if text not in index:
+            index[text] = len(strings)
+            strings.append(text)
+        return index[text]
+
+    def add(kind, x=0, y=0, z=0, w=0, d=0, h=0, a=None, b=None):
+        rows.append((KIND[kind], x, y, z, w, d, h, s(a), s(b)))
+
+    if 'random_keys' in src:
+        r = src['random_keys']
+        add('random_keys', r['count'], r['range'])
+    if 'random_chests' in src:
+        r = src['random_chests']
+        add('random_chests', r['count'], r['range'], a='|'.join(r['contents']))
+    add('bounds', src['bounds']['field_size'], h=src['bounds'].get('wall_height', 800))
+    if 'player' in src:
+        add('player', *src['player'])
+    if 'start_message' in src:
+        add('start_message', a=src['start_message'])
+    for name, t in src.get('triggers', {}).items():
+        add('trigger', a=name, b=t['message'])
+        for x, y in t.get('spawn', ()):
+            add('trigger_spawn', x, y, a=name)
+    for x, y in src.get('checkpoint_tiles', ()):
+        add('checkpoint', x, y)
+    for x, y in src.get('lava_tiles', ()):
+        add('lava', x, y)
+    for x, y, trigger in src.get('golden_tiles', ()):
+        add('golden', x, y, a=trigger)
+    for x, y in src.get('exit_tiles', ()):
+        add('exit', x, y)
+    for color, (x, y, z) in src.get('portals', {}).items():
+        add('portal', x, y, z, a=color)
+    for x, y, contents in src.get('chests', ()):
+        add('chest', x, y, a='|'.join(contents))
+    for x, y, z, w, d, h, color in src.get('obstacles', ()):
+        add('obstacle', x, y, z, w, d, h, a=color)
+    if 'random_enemies' in src:
+        r = src['random_enemies']
+        add('random_enemies', r['count'], a=r['kind'])
+    for x, y, kind in src.get('enemies', ()):
+        add('enemy', x, y, a=kind)
+    if 'keys_per_chest' in src:
+        add('keys_per_chest', src['keys_per_chest']['pad'])
+    records = np.array(rows, RECORD)
+    width = max([len(t) for t in strings] + [1])
+    return records, np.array(strings, f'<U{width}')
+
+
+_loaded = {}  # level number -> LevelData, for restarts within one run
+
+
+def cache_paths(level, directory=LEVEL_DIR):
+    base = os.path.join(directory, '__cache__', f'level{level}.v{CACHE_VERSION}')
+    return base + '.records.npy', base + '.strings.npy'
+
+
+def level_path(level, directory=LEVEL_DIR):
+    return os.path.join(directory, f'level{level}.json')
+
+
+def level_exists(level, directory=LEVEL_DIR):
+    return os.path.exists(level_path(level, directory))
+
+
+def save_array(path, array):
+    # np.save to a temporary file in the same directory, then rename it over
+    # path; readers see the old file or the whole new one, never a partial one
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def load_level(level, directory=LEVEL_DIR):
+    data = _loaded.get((level, directory))
+    if data is not None:
+        return data
+    src = level_path(level, directory)
+    rec_path, str_path = cache_paths(level, directory)
+    try:
+        fresh = min(os.path.getmtime(rec_path), os.path.getmtime(str_path)) >= os.path.getmtime(src)
+    except OSError:
+        fresh = False
+    if fresh:
+        try:
+            data = LevelData(np.load(rec_path, mmap_mode='r'), np.load(str_path).tolist())
+        except (ValueError, EOFError, OSError):
+            data = None  # damaged cache, e.g. left by an older non-atomic write: rebuild it
+    if data is None:
+        with open(src) as f:
+            records, strings = compile_level(json.load(f))
+        try:
+            os.makedirs(os.path.dirname(rec_path), exist_ok=True)
+            save_array(rec_path, records)
+            save_array(str_path, strings)
+        except OSError:
+            pass  # read-only install: use the compiled arrays without caching them
+        data = LevelData(records, strings.tolist())
+    _loaded[(level, directory)] = data
+    return data
@@ -1,18 +1,31 @@
 #Necessary imports for the game to run
 
+import time
+launch_time = time.perf_counter()  # for the time to first frame
+
 from operator import gt
-from OpenGL.GL import *
-from OpenGL.GLU import *
-from OpenGL.GLUT import *
-import math, random, time
+import math, random, sys, threading, zlib
+
+import numpy as np
+
+import font
+import glbind
+import levelfile
+import meshes
+import perfstats
+import profiling
+import transform
+from font import BitmapFont
+from frustum import Frustum
+from projectiles import BulletPool, EnemyShotPool
+from spatial import SpatialGrid
 
 #Variables for window and camera
 window_width, window_height = 1000, 800
 aspect_ratio = window_width/ window_height
 fovY_default = 77.3
 fovY_scoped  = 40.0
-yaw_step_values = [0.8, 0.25]
-yaw_step = yaw_step_values[0]
+yaw_step_values = [0.8, 0.25]  # degrees per tick turning, unscoped and scoped
 
 #Camera modes
 cam_first  = 0
@@ -23,6 +36,27 @@ camera_mode = cam_third
 #Current FOV; updated when scoping
 fovY = fovY_default
 
+#Fixed timestep: the simulation always advances in 1/60 s ticks, rendering
+#interpolates between the last two ticks
+SIM_HZ = 60
+SIM_DT = 1.0 / SIM_HZ
+MAX_TICKS_PER_FRAME = 5  # drop backlog instead of spiralling after a stall
+sim_accum = 0.0
+last_frame_time = None
+frame_dt = SIM_DT
+render_alpha = 1.0
+
+#Performance overlay (F3): rolling graph of simulation vs render time per
+#frame, FPS percentiles and the counters below, which the game adds to at
+#its existing loops (an add() is a flag test while the overlay is off)
+perf_overlay = False
+frame_times = perfstats.FrameTimes(240)
+perf_counters = perfstats.Counters('ticks', 'enemies', 'bullets', 'enemy shots', 'tiles tested',
+                                   'collision pairs', 'draw calls', 'culled')
+sim_time_ms = 0.0  # time spent in ticks since the last display()
+PERF_GRAPH_H = 80      # graph height in pixels...
+PERF_GRAPH_MS = 33.3   # ...and the frame time it spans
+
 #Third-person camera parameters
 third_cam_back = 120.0
 third_cam_side = 30.0
@@ -31,51 +65,34 @@ camera_smooth = 0.15
 cam_eye = None
 cam_cen = None
 
-#Variables for the checkpoint tile functionality
-checkpoint_tiles = []
-GRID_Z = 10
-
-#Variables for the exit tile functionality
-exit_tiles = []
-
-lava_tiles = []
-lava_msg = ""
-lava_msg_timer = 0
-
-golden_tiles = []
-golden_tile_msg = ""
-golden_tile_msg_timer = 0
+#Level of detail for curved primitives, picked from projected size on screen.
+#Bands are (min projected radius in pixels, tessellation scale), checked in
+#order; e.g. a 24x24 sphere drawn 10 px across uses the 0.25 band (6x6).
+#Edit the bands to trade quality for frame time; [(0, 1.0)] turns LOD off.
+lod_bands = [(32.0, 1.0), (12.0, 0.5), (4.0, 0.25), (0.0, 0.125)]
+LOD_MIN_SLICES = 6
+LOD_MIN_STACKS = 4
+view_eye = None            # camera eye of the frame being drawn, set by camera()
+lod_pixels_per_unit = 1.0  # screen pixels per world unit at distance 1, set by camera()
+
+#Frustum culling: view_frustum is rebuilt by camera() every frame and is None
+#when nothing has been drawn yet (headless runs cull nothing); cull_stats
+#counts objects/batches drawn vs culled in the current frame
+view_frustum = None
+cull_stats = {'drawn': 0, 'culled': 0}
 
-obstacles = []
-
-#Messages for level 1 tutorials
-level1_start_msg = ""
-level1_msg_active = False
-
-level1_checkpoint_msg = ""
-level1_checkpoint_msg_active = False
-
-level1_enemy_stat = 0
+GRID_Z = 10
 
-level1_all_enemies_msg = ""
-level1_all_enemies_msg_active = False
-level1_enemies_spawned = False  # Track if the 5 enemies have been spawned
+#Static level geometry (floor, tiles, walls, obstacles) is compiled into GL
+#display lists, one per layer and STATIC_CHUNK-sized patch of floor so each
+#can be frustum culled, and only rebuilt after invalidate_static_layer().
+#The lists are kept per World, see World.static_batches
+STATIC_CHUNK = 800.0
 
-trap_triggered = False
-trap_spawn_locations = [
-    (-100, 900),
-    (-100, 700),
-    (-100, 500),
-    (-100, 300),
-    (-100, 100),
-    (-100, -100),
-    (-100, -300),
-    (-100, -500),
-    (-100, -700),
-    (-100, -900)
-]
+def invalidate_static_layer(w):
+    w.static_layer_dirty = True
+    w.static_plan = None
 
-once = 0
 #Utility functions
 
 #To keep stats within valid range
@@ -116,44 +133,56 @@ preset_colors = {
 def get_color(name):
     return preset_colors.get(name, (1.0, 1.0, 1.0))
 
-#Draw text on the screen
+#All text goes through one display-list font, built once the GL context exists
+hud_font = BitmapFont('GLUT_BITMAP_HELVETICA_18')
+
+#Draw text on the screen at window pixel (x, y)
 def draw_text(x, y, text, color = (1, 1, 1), font=None):
     glColor3f(*color)
-    glMatrixMode(GL_PROJECTION)
-    glPushMatrix()
-    glLoadIdentity()
-    
-    # Set up an orthographic projection that matches window coordinates
-    gluOrtho2D(0, 1000, 0, 800)  # left, right, bottom, top
-
-    
-    glMatrixMode(GL_MODELVIEW)
-    glPushMatrix()
-    glLoadIdentity()
-    
-    # Pick a bitmap font safely (avoid NameError during import time)
-    if font is None:
-        font = globals().get('GLUT_BITMAP_HELVETICA_18', None) or globals().get('GLUT_BITMAP_9_BY_15', None)
-    # Draw text at (x, y) in screen coordinates
-    glRasterPos2f(x, y)
-    if font is not None:
-        for ch in text:
-            glutBitmapCharacter(font, ord(ch))
-    
-    # Restore original projection and modelview matrices
-    glPopMatrix()
-    glMatrixMode(GL_PROJECTION)
-    glPopMatrix()
-    glMatrixMode(GL_MODELVIEW)
+    (font or hud_font).draw(x, y, text)
+
+#Draw text centred horizontally on window pixel column cx
+def draw_text_centered(cx, y, text, color = (1, 1, 1), font=None):
+    font = font or hud_font
+    draw_text(cx - font.width(text) // 2, y, text, color, font)
+
+def lod_scale(x, y, z, radius):
+    # Tessellation scale for a primitive of this bounding radius at (x, y, z)
+    if view_eye is None:
+        return 1.0
+    d = math.sqrt((x-view_eye[0])**2 + (y-view_eye[1])**2 + (z-view_eye[2])**2) + 1e-6
+    px = radius / d * lod_pixels_per_unit
+    for min_px, scale in lod_bands:
+        if px >= min_px:
+            return scale
+    return lod_bands[-1][1]
+
+def lod_tessellation(slices, stacks, scale):
+    if scale >= 1.0:
+        return slices, stacks
+    return (max(LOD_MIN_SLICES, int(round(slices*scale))),
+            min(stacks, max(LOD_MIN_STACKS, int(round(stacks*scale)))))
 
 #Core functions
 
 class Entity:
+    # Every class in the hierarchy declares __slots__ (no per-instance
+    # __dict__); a subclass needs its own __slots__ for any new attribute
+    __slots__ = ('x', 'y', 'z', 'rx', 'ry', 'rz', 'width', 'depth', 'height',
+                 'x_min', 'y_min', 'z_min', 'x_max', 'y_max', 'z_max',
+                 'prev_x', 'prev_y', 'prev_z', '_matrix')
+
     def __init__(self, x, y, z, rx=0, ry=0, rz=0, width=1, depth=1, height=1):
         self.x, self.y, self.z = x, y, z
         self.rx, self.ry, self.rz = rx, ry, rz
         self.width, self.depth, self.height = width, depth, height
+        self._matrix = None  # cached model matrix, see matrix()
         self.sync_bounding_box()
+        self.save_prev()
+
+    def save_prev(self):
+        # Position at the start of the current tick, for render interpolation
+        self.prev_x, self.prev_y, self.prev_z = self.x, self.y, self.z
 
     def sync_bounding_box(self):
         # Treat (x,y,z) as center of the volume for AABB
@@ -161,8 +190,23 @@ class Entity:
         self.y_min = self.y - self.depth/2;  self.y_max = self.y + self.depth/2
         self.z_min = self.z - self.height/2; self.z_max = self.z + self.height/2
 
-    def draw(self):
-        #To be drawn by the child classes
+    def invalidate(self):
+        # Call after changing position, rotation or size directly
+        self.sync_bounding_box()
+        self._matrix = None
+
+    def build_matrix(self):
+        return transform.trs(self.x, self.y, self.z, self.rx, self.ry, self.rz, self.width, self.depth, self.height)
+
+    def matrix(self):
+        # Model matrix (column-major, for glMultMatrixf), rebuilt only after invalidate()
+        if self._matrix is None:
+            self._matrix = self.build_matrix()
+        return self._matrix
+
+    def draw(self, lod_at=None):
+        #To be drawn by the child classes; lod_at is the world point used
+        #for level of detail when the entity is a part of a compound model
         pass
 
     def check_collision(self, other):
@@ -184,6 +228,7 @@ class Entity:
         dz = self.z - az
         self.y = ay + dy * math.cos(rad) - dz * math.sin(rad)
         self.z = az + dy * math.sin(rad) + dz * math.cos(rad)
+        self.invalidate()
 
     def rotate_y(self, ry, ax, az):
         self.ry += ry
@@ -192,6 +237,7 @@ class Entity:
         dz = self.z - az
         self.x = ax + dx * math.cos(rad) + dz * math.sin(rad)
         self.z = az - dx * math.sin(rad) + dz * math.cos(rad)
+        self.invalidate()
 
     def rotate_z(self, rz, ax, ay):
         self.rz += rz
@@ -200,66 +246,146 @@ class Entity:
         dy = self.y - ay
         self.x = ax + dx * math.cos(rad) - dy * math.sin(rad)
         self.y = ay + dx * math.sin(rad) + dy * math.cos(rad)
+        self.invalidate()
 
 #Class for the implementation of checkpoint tiles.
 class CheckpointTile(Entity):
+    __slots__ = ('active', 'saved')
     def __init__(self, x, y, z=GRID_Z):
         super().__init__(x, y, z, width=100, depth=100, height=0)
         self.active = True
         self.saved = False
 
 #To place the checkpoint tiles on individual levels
-def place_checkpoint_tile(x, y):
-    checkpoint_tiles.append(CheckpointTile(x, y))
+def place_checkpoint_tile(w, x, y):
+    w.checkpoint_tiles.append(CheckpointTile(x, y))
+    invalidate_static_layer(w)
 
-def set_checkpoint(pos):
-    global last_checkpoint
-    last_checkpoint = pos
+def set_checkpoint(w, pos):
+    w.last_checkpoint = pos
 
-def load_checkpoint():
-    global load_uses_left
-    if last_checkpoint and load_uses_left>0:
-        load_uses_left -= 1
-        place_player(last_checkpoint[0], last_checkpoint[1])
+def load_checkpoint(w):
+    if w.last_checkpoint and w.load_uses_left>0:
+        w.load_uses_left -= 1
+        place_player(w, w.last_checkpoint[0], w.last_checkpoint[1])
 
 
 # Class for the implementation of level exit tiles.
 class LevelExitTile(Entity):
+    __slots__ = ('active',)
     def __init__(self, x, y, z=GRID_Z):
         super().__init__(x, y, z, width=100, depth=100, height=8)
         self.active = True
 
 # To place the exit tiles on individual levels
-def place_exit_tile(x, y):
-    global exit_tiles
-    exit_tiles.append(LevelExitTile(x, y))
+def place_exit_tile(w, x, y):
+    w.exit_tiles.append(LevelExitTile(x, y))
+    invalidate_static_layer(w)
 
 class LavaTile(Entity):
+    __slots__ = ('active',)
     def __init__(self, x, y, z=GRID_Z):
         super().__init__(x, y, z, width=100, depth=100, height=0)
         self.active = True
 
-def place_lava_tile(x, y):
-    lava_tiles.append(LavaTile(x, y))
+def place_lava_tile(w, x, y):
+    w.lava_tiles.append(LavaTile(x, y))
+    invalidate_static_layer(w)
 
 class GoldenTile(Entity):
-    def __init__(self, x, y, z=GRID_Z, message=""):
+    __slots__ = ('active', 'message', 'trigger', 'triggered')
+    def __init__(self, x, y, z=GRID_Z, message="", trigger=None):
         super().__init__(x, y, z, width=200, depth=200, height=0)
         self.active = True
         self.message = message
+        self.trigger = trigger  # id in level_triggers, keys the trap behaviour
         self.triggered = False
 
-def place_golden_tile(x, y, message):
-    golden_tiles.append(GoldenTile(x, y, GRID_Z, message))
+def place_golden_tile(w, x, y, trigger):
+    w.golden_tiles.append(GoldenTile(x, y, GRID_Z, w.level_triggers[trigger]['message'], trigger))
+    invalidate_static_layer(w)
 
 class Shape3D(Entity):
-    quadric = gluNewQuadric()
+    __slots__ = ('color',)
+    quadric = None  # shared GLU quadric, created on first use
+    # Shared unit meshes, built once per (primitive, slices, stacks, radius
+    # ratio) and replayed under each instance's transform
+    mesh_lists = {}   # key -> GL display list
+    mesh_arrays = {}  # key -> (n, 3) float32 triangles for batched draws
+    mesh_stats = {'hits': 0, 'misses': 0}
 
     def __init__(self, color, x, y, z, rx, ry, rz, *dims):
         self.color = get_color(color)
         super().__init__(x, y, z, rx, ry, rz, *dims)
 
+    @classmethod
+    def emit_mesh(cls, primitive, slices, stacks, ratio):
+        if cls.quadric is None:
+            Shape3D.quadric = gluNewQuadric()
+        if primitive == 'sphere':
+            gluSphere(cls.quadric, 1, slices, stacks)
+        elif primitive == 'cylinder':
+            gluCylinder(cls.quadric, 1, ratio, 1, slices, stacks)
+        else:
+            glutSolidCube(1)
+
+    @classmethod
+    def mesh_list(cls, primitive, slices=1, stacks=1, ratio=1.0):
+        # Display list for a unit sphere (radius 1), cylinder (base radius 1,
+        # top radius ratio, height 1 along +z) or cube (side 1). Returns None
+        # on a miss while another list is being recorded, since list creation
+        # can't nest; the caller then emits the geometry directly.
+        key = (primitive, slices, stacks, ratio)
+        lst = cls.mesh_lists.get(key)
+        if lst is not None:
+            cls.mesh_stats['hits'] += 1
+            return lst
+        cls.mesh_stats['misses'] += 1
+        if glGetIntegerv(GL_LIST_INDEX):
+            return None
+        lst = glGenLists(1)
+        glNewList(lst, GL_COMPILE)
+        cls.emit_mesh(primitive, slices, stacks, ratio)
+        glEndList()
+        cls.mesh_lists[key] = lst
+        return lst
+
+    @classmethod
+    def draw_mesh(cls, primitive, slices=1, stacks=1, ratio=1.0):
+        # Cached unit mesh at the current transform
+        lst = cls.mesh_list(primitive, slices, stacks, ratio)
+        if lst is None:
+            cls.emit_mesh(primitive, slices, stacks, ratio)
+        else:
+            glCallList(lst)
+        perf_counters.add('draw calls')
+
+    @classmethod
+    def mesh_vertices(cls, primitive, slices=1, stacks=1, ratio=1.0):
+        # Same unit meshes as triangle arrays, for CPU-side batching
+        key = (primitive, slices, stacks, ratio)
+        verts = cls.mesh_arrays.get(key)
+        if verts is None:
+            cls.mesh_stats['misses'] += 1
+            if primitive == 'sphere':
+                verts = meshes.sphere(slices, stacks)
+            elif primitive == 'cylinder':
+                verts = meshes.cylinder(slices, stacks, ratio)
+            else:
+                verts = meshes.cube()
+            cls.mesh_arrays[key] = verts
+        else:
+            cls.mesh_stats['hits'] += 1
+        return verts
+
+    @classmethod
+    def mesh_cache_report(cls):
+        s = cls.mesh_stats
+        return (f"mesh cache: {len(cls.mesh_lists)} lists, {len(cls.mesh_arrays)} arrays, "
+                f"{s['hits']} hits, {s['misses']} misses")
+
 class Sphere(Shape3D):
+    __slots__ = ()
     def __init__(self, color, x, y, z, rx, ry, rz, *dims):
         #If only a single radius was passed, expand to (r, r, r)
         if len(dims) == 1:
@@ -267,37 +393,44 @@ class Sphere(Shape3D):
             dims = (r, r, r)
         super().__init__(color, x, y, z, rx, ry, rz, *dims)
 
-    def draw(self):
+    def draw(self, lod_at=None):
         glColor3f(*self.color)
         glPushMatrix()
-        glTranslatef(self.x, self.y, self.z)
-        glRotatef(self.rx, 1, 0, 0)
-        glRotatef(self.ry, 0, 1, 0)
-        glRotatef(self.rz, 0, 0, 1)
         #Use the three stored dimensions; for heads these are equal so it's round
-        glScalef(self.width, self.depth, self.height)
-        #Higher tessellation for a smoother, circular look
-        gluSphere(self.quadric, 1, 24, 24)
+        glMultMatrixf(self.matrix())
+        #Higher tessellation for a smoother, circular look, reduced with distance
+        self.draw_mesh('sphere', *self.tessellation(lod_at))
         glPopMatrix()
 
+    def tessellation(self, lod_at=None):
+        x, y, z = lod_at or (self.x, self.y, self.z)
+        return lod_tessellation(24, 24, lod_scale(x, y, z, max(self.width, self.depth, self.height)))
+
+    def batch_instance(self, lod_at=None):
+        # (mesh key, origin, scale) for batched drawing; None if rotated
+        if self.rx or self.ry or self.rz: return None
+        return ('sphere', *self.tessellation(lod_at), 1.0), (self.x, self.y, self.z), (self.width, self.depth, self.height)
+
 class Box(Shape3D):
+    __slots__ = ()
     def __init__(self, color, x, y, z, rx, ry, rz, *dims):
         super().__init__(color, x, y, z, rx, ry, rz, *dims)
         
-    def draw(self):
+    def draw(self, lod_at=None):
         glColor3f(*self.color)
         glPushMatrix()
-        glTranslatef(self.x, self.y, self.z)
-        glRotatef(self.rx, 1, 0, 0)
-        glRotatef(self.ry, 0, 1, 0)
-        glRotatef(self.rz, 0, 0, 1)
-        glScalef(self.width, self.depth, self.height)
-        glutSolidCube(1)
+        glMultMatrixf(self.matrix())
+        self.draw_mesh('cube')
         glPopMatrix()
 
+    def batch_instance(self, lod_at=None):
+        if self.rx or self.ry or self.rz: return None
+        return ('cube', 1, 1, 1.0), (self.x, self.y, self.z), (self.width, self.depth, self.height)
+
 class Cylinder(Shape3D):
     # Cylinder with configurable pivot anchor: 'center', 'base', or 'top'
     # Drawn as a GLU cylinder extruded along +Z from its local origin.
+    __slots__ = ('radius', 'top_radius', 'anchor')
     def __init__(self, color, x, y, z, rx, ry, rz, radius=10, height=20, top_radius=None, anchor='center'):
         super().__init__(color, x, y, z, rx, ry, rz, radius*2, radius*2, height)
         self.radius = radius
@@ -305,65 +438,118 @@ class Cylinder(Shape3D):
         self.height = height
         self.anchor = anchor  # 'center'|'base'|'top'
         
-    def draw(self):
-        glColor3f(*self.color)
-        glPushMatrix()
+    def build_matrix(self):
         # Position according to anchor so rotations pivot correctly
-        if self.anchor == 'base':
-            glTranslatef(self.x, self.y, self.z)
-        elif self.anchor == 'top':
-            glTranslatef(self.x, self.y, self.z)
-        else:  # center
-            glTranslatef(self.x, self.y, self.z - self.height/2)
-        # Apply rotation at pivot
-        glRotatef(self.rx, 1, 0, 0)
-        glRotatef(self.ry, 0, 1, 0)
-        glRotatef(self.rz, 0, 0, 1)
+        z = self.z - self.height/2 if self.anchor == 'center' else self.z
         # For 'top' anchor, draw downwards by translating -height then extruding +Z
-        if self.anchor == 'top':
-            glTranslatef(0, 0, -self.height)
-        # For 'base', start at base; for 'center', already moved to base-like start
-        gluCylinder(self.quadric, self.radius, self.top_radius, self.height, 16, 1)
+        oz = -1.0 if self.anchor == 'top' else 0.0
+        return transform.trs(self.x, self.y, z, self.rx, self.ry, self.rz, self.radius, self.radius, self.height, oz)
+
+    def draw(self, lod_at=None):
+        glColor3f(*self.color)
+        glPushMatrix()
+        glMultMatrixf(self.matrix())
+        self.draw_mesh('cylinder', self.slices(lod_at), 1, self.top_radius / self.radius)
         glPopMatrix()
 
+    def slices(self, lod_at=None):
+        x, y, z = lod_at or (self.x, self.y, self.z)
+        r = max(self.radius, self.top_radius, self.height/2)
+        return lod_tessellation(16, 1, lod_scale(x, y, z, r))[0]
+
+    def batch_instance(self, lod_at=None):
+        if self.rx or self.ry or self.rz: return None
+        if self.anchor == 'center': z = self.z - self.height/2
+        elif self.anchor == 'top': z = self.z - self.height
+        else: z = self.z
+        return (('cylinder', self.slices(lod_at), 1, self.top_radius / self.radius), (self.x, self.y, z),
+                (self.radius, self.radius, self.height))
+
 class CompoundEntity(Entity):
+    # Parts are stored relative to the model origin (the mean of their
+    # centres at construction) and drawn under the model matrix. The matrix
+    # and world AABB are cached: sync_bounding_box() marks them dirty after the
+    # origin, rotation or scale changes, invalidate() after a part changes.
+    __slots__ = ('entities', 'scale', '_local_box', '_bounds')
+
     def __init__(self, *entities):
         x = sum(e.x for e in entities)/len(entities)
         y = sum(e.y for e in entities)/len(entities)
         z = sum(e.z for e in entities)/len(entities)
-        x_min = min(e.x_min for e in entities)
-        y_min = min(e.y_min for e in entities)
-        z_min = min(e.z_min for e in entities)
-        x_max = max(e.x_max for e in entities)
-        y_max = max(e.y_max for e in entities)
-        z_max = max(e.z_max for e in entities)
-        rx = 0; ry = 0; rz = 0
-        width = x_max - x_min
-        depth = y_max - y_min
-        height = z_max - z_min
-        super().__init__(x, y, z, rx, ry, rz, width, depth, height)
-        self.x_min = x_min; self.y_min = y_min; self.z_min = z_min
-        self.x_max = x_max; self.y_max = y_max; self.z_max = z_max
+        for e in entities:
+            e.x -= x; e.y -= y; e.z -= z
+            e.invalidate()
         self.entities = list(entities)
-        
-    def draw(self):
-        for entity in self.entities: entity.draw()
+        self.scale = 1.0
+        self._local_box = None
+        self._bounds = None
+        super().__init__(x, y, z)
+        x_min, y_min, z_min, x_max, y_max, z_max = self.local_box()
+        self.width = x_max - x_min
+        self.depth = y_max - y_min
+        self.height = z_max - z_min
+
+    def sync_bounding_box(self):
+        self._matrix = None
+        self._bounds = None
+
+    def invalidate(self):
+        for e in self.entities: e.invalidate()
+        self._local_box = None
+        self.sync_bounding_box()
+
+    def build_matrix(self):
+        s = self.scale
+        return transform.trs(self.x, self.y, self.z, self.rx, self.ry, self.rz, s, s, s)
+
+    def local_box(self):
+        # Union of the parts' AABBs in model space
+        if self._local_box is None:
+            es = self.entities
+            self._local_box = (min(e.x_min for e in es), min(e.y_min for e in es), min(e.z_min for e in es),
+                               max(e.x_max for e in es), max(e.y_max for e in es), max(e.z_max for e in es))
+        return self._local_box
+
+    def bounds(self):
+        # World AABB of the model
+        if self._bounds is None:
+            self._bounds = transform.apply_box(self.matrix(), *self.local_box())
+        return self._bounds
+
+    x_min = property(lambda self: self.bounds()[0])
+    y_min = property(lambda self: self.bounds()[1])
+    z_min = property(lambda self: self.bounds()[2])
+    x_max = property(lambda self: self.bounds()[3])
+    y_max = property(lambda self: self.bounds()[4])
+    z_max = property(lambda self: self.bounds()[5])
+
+    def part_position(self, e):
+        # World position of one of the parts
+        return transform.apply(self.matrix(), e.x, e.y, e.z)
+
+    def draw(self, lod_at=None):
+        glPushMatrix()
+        glMultMatrixf(self.matrix())
+        at = lod_at or (self.x, self.y, self.z)
+        for entity in self.entities: entity.draw(at)
+        glPopMatrix()
 
     def rotate_x(self, rx):
         self.rx += rx
-        for entity in self.entities: entity.rotate_x(rx, self.y, self.z)
+        self.sync_bounding_box()
 
     def rotate_y(self, ry):
         self.ry += ry
-        for entity in self.entities: entity.rotate_y(ry, self.x, self.z)
+        self.sync_bounding_box()
 
     def rotate_z(self, rz):
         self.rz += rz
-        for entity in self.entities: entity.rotate_z(rz, self.x, self.y)
+        self.sync_bounding_box()
 
 #Game models
 
 class Chest(CompoundEntity):
+    __slots__ = ('closed', 'contains')
     def __init__(self, x, y, ground_z, rx=0, ry=0, rz=0, w=60, d=40, h=40):
         base_h = 0.6*h
         base_z = ground_z + base_h/2
@@ -382,20 +568,24 @@ class Chest(CompoundEntity):
         ins_1 = self.entities[1]
         lid = self.entities[2]
         ins_2 = self.entities[3]
-        lid.rotate_x(-135, lid.y_max, lid.z_min)
-        ins_2.rotate_x(-135, lid.y_max, lid.z_min)
+        hinge_y, hinge_z = lid.y_max, lid.z_min
+        lid.rotate_x(-135, hinge_y, hinge_z)
+        ins_2.rotate_x(-135, hinge_y, hinge_z)
         ins_1.color = get_color('gold')
         ins_2.color = get_color('chest_dark')
+        self.invalidate()
         self.closed = False
         
     def close(self):
         ins_1 = self.entities[1]
         lid = self.entities[2]
         ins_2 = self.entities[3]
-        lid.rotate_x(135, lid.y_max, lid.z_min)
-        ins_2.rotate_x(135, lid.y_max, lid.z_min)
+        hinge_y, hinge_z = lid.y_max, lid.z_min
+        lid.rotate_x(135, hinge_y, hinge_z)
+        ins_2.rotate_x(135, hinge_y, hinge_z)
         ins_1.color = get_color('chest_dark')
         ins_2.color = get_color('chest_maroon')
+        self.invalidate()
         self.closed = True
         
     def toggle(self):
@@ -403,8 +593,10 @@ class Chest(CompoundEntity):
             self.open()
         else: self.close()
 
-player_style = "Regular"
 class StickPlayer(CompoundEntity):
+    __slots__ = ('styles', 'style', 'leg_h', 'body_h', 'head_r', 'arm_h', 'arm_r', 'leg_r', 'body_r',
+                 'shoulder_span', 'on_ground_z', 'anim', 'anim_dir', 'speed', 'jump_v', 'health',
+                 'damage', 'inventory', 'active_slot', 'head_visible', 'yaw')
     def __init__(self, x, y, ground_z, rz):
         self.styles = ['Regular',  'Hero', 'Hulk']
         self.style = 0
@@ -439,7 +631,7 @@ class StickPlayer(CompoundEntity):
         self.health = 100
         self.damage = 10
         self.inventory = {'handgun_ammo':24, 'rifle_ammo': 30, 'keys':0,'Nourishment':1,'Aegis':0,'Shard':0,'portalgun':0}
-        self.active_slot = 1
+        self.active_slot = 1  # selected inventory slot, see inventory_slots
         self.head_visible = True
         self.yaw = 0
 
@@ -457,11 +649,10 @@ class StickPlayer(CompoundEntity):
         self.anim += self.anim_dir
         swing = 12.0 * math.sin(self.anim * math.pi)
         leg_left.rx = swing; leg_right.rx = -swing
+        leg_left.invalidate(); leg_right.invalidate()
 
     def move(self, dx, dy):
         self.x += dx; self.y += dy
-        for e in self.entities:
-            e.x += dx; e.y += dy; e.sync_bounding_box()
         self.sync_bounding_box()
 
     def stand_center_z(self):
@@ -474,18 +665,13 @@ class StickPlayer(CompoundEntity):
     def physics(self):
         if self.jump_v != 0:
             self.z += self.jump_v
-            for e in self.entities:
-                e.z += self.jump_v; e.sync_bounding_box()
             self.jump_v -= 0.35
             if self.z <= self.stand_center_z():
-                dz = self.stand_center_z() - self.z
-                self.z += dz
-                for e in self.entities:
-                    e.z += dz; e.sync_bounding_box()
+                self.z = self.stand_center_z()
                 self.jump_v = 0.0
         self.sync_bounding_box()
 
-    def draw(self):
+    def draw(self, lod_at=None):
         hip_z = self.on_ground_z + self.leg_h
         shoulder_z = hip_z + self.body_h
         head_center_z = shoulder_z + self.head_r + 4.0
@@ -523,19 +709,21 @@ class StickPlayer(CompoundEntity):
         #gluCylinder(Sphere.quadric, self.arm_r, self.arm_r, self.arm_h, 16, 1)
         
         # weapon
-        if selected_slot == 2: 
+        if self.active_slot == 2: 
             glPushMatrix()
             glTranslatef(0, 0, self.arm_h - 2)
             glRotatef(90, 0, 1, 0)
             glColor3f(0.05, 0.05, 0.05) 
-            gluCylinder(Sphere.quadric, 4, 4, 60, 16, 1) 
+            glScalef(4, 4, 60)
+            Shape3D.draw_mesh('cylinder', 16, 1)
             glPopMatrix()
         else:
             glPushMatrix()
             glTranslatef(0, 0, self.arm_h - 2)
             glRotatef(90, 0, 1, 0)
             glColor3f(0.3, 0.3, 0.3)
-            gluCylinder(Sphere.quadric, 3, 3, 30, 12, 1)
+            glScalef(3, 3, 30)
+            Shape3D.draw_mesh('cylinder', 12, 1)
             glPopMatrix()
         glPopMatrix()
 
@@ -547,11 +735,14 @@ class StickPlayer(CompoundEntity):
             # gluSphere(Sphere.quadric, self.head_r, 10, 10)
             glPopMatrix()
         glPopMatrix()
+        glPushMatrix()
+        glMultMatrixf(self.matrix())
+        at = lod_at or (self.x, self.y, self.z)
         for i, e in enumerate(self.entities):
             if i==5 and not self.head_visible: continue
-            e.draw()
+            e.draw(at)
+        glPopMatrix()
     def change_style(self):
-        global player_style
         self.style += 1
         self.style %= len(self.styles)
         style = self.styles[self.style]
@@ -582,10 +773,11 @@ class StickPlayer(CompoundEntity):
             leg2.color = get_color('hulk_purple')
             arm1.color = get_color('hulk_green')
             arm2.color = get_color('hulk_green')
-        player_style = style
+        body.invalidate()
 
 class Enemy(CompoundEntity):
-    def __init__(self, x, y, ground_z, is_boss=False, speed = 3):
+    __slots__ = ('speed', 'is_boss', 'base_color', 'pulse', 'hp', 'grid', 'shoot_cool', 'hit_radius', 'spikes')
+    def __init__(self, x, y, ground_z, is_boss=False, speed = 3, rng=random):
         # Boss gets a scarier, bigger model with grey head and black body
         if is_boss:
             body_col, head_col = 'black', 'grey'
@@ -608,8 +800,8 @@ class Enemy(CompoundEntity):
                 spike_entities.append(spike)
         else:
             palette = ['red', 'orange', 'light_blue', 'cyan', 'yellow']
-            body_col = random.choice(palette)
-            head_col = random.choice([c for c in palette if c != body_col])
+            body_col = rng.choice(palette)
+            head_col = rng.choice([c for c in palette if c != body_col])
             # slightly bigger normal enemy
             body_h = 50.0
             body_r = 24.0
@@ -639,10 +831,9 @@ class Enemy(CompoundEntity):
         self.pulse = 0.0
         self.speed = 0.5 if not is_boss else 0.8
         self.hp = 20 if not is_boss else 120
-        self.projectiles = []  # boss only
+        self.grid = None  # spatial index this enemy is registered in
         # give the boss an initial cooldown so it doesn't start firing instantly
         self.shoot_cool = 220 if is_boss else 0
-        self._pulse_scale = 1.0
         # hit radius for bullet collision (horizontal plane)
         self.hit_radius = max(body_r, head_r) * 1.2
         # Boss lives represented by grey spikes around the head
@@ -661,6 +852,7 @@ class Enemy(CompoundEntity):
                 spike = self.spikes.pop()
                 try:
                     self.entities.remove(spike)
+                    self.invalidate()
                 except ValueError:
                     pass
                 return 'defeated' if len(self.spikes) == 0 else 'hit'
@@ -671,15 +863,11 @@ class Enemy(CompoundEntity):
             self.hp -= dmg
             return 'defeated' if self.hp <= 0 else 'hit'
 
-    def update(self, target):
+    def update(self, target, shots):
         # Very slow pulse
         self.pulse += 0.003
-        s = 1.0 + 0.12 * math.sin(self.pulse)
-        self._pulse_scale = s
-        # Keep bbox updated for collisions
-        for e in self.entities:
-            e.width *= s; e.depth *= s; e.height *= s; e.sync_bounding_box()
-            e.width /= s; e.depth /= s; e.height /= s
+        # (scales the model matrix, and with it the bbox used for collisions)
+        self.scale = 1.0 + 0.12 * math.sin(self.pulse)
 
         # chase (speed is 0 for now per user setting)
         dx = target.x - self.x
@@ -688,9 +876,8 @@ class Enemy(CompoundEntity):
         vx = self.speed * (dx / d)
         vy = self.speed * (dy / d)
         self.x += vx; self.y += vy
-        for e in self.entities:
-            e.x += vx; e.y += vy; e.sync_bounding_box()
         self.sync_bounding_box()
+        if self.grid is not None: self.grid.update(self, self.x, self.y)
 
         if self.is_boss:
             self.shoot_cool -= 1
@@ -699,54 +886,26 @@ class Enemy(CompoundEntity):
                 self.shoot_cool = 220
                 bvx = 3.5 * (dx / d)
                 bvy = 3.5 * (dy / d)
-                # much bigger range
-                self.projectiles.append({'x': self.x, 'y': self.y, 'z': self.z + 20, 'vx': bvx, 'vy': bvy, 'life': 2000})
-            for b in self.projectiles:
-                b['x'] += b['vx']; b['y'] += b['vy']
-                b['life'] -= 1
-            self.projectiles = [b for b in self.projectiles if b['life'] > 0]
+                # much bigger range; shots live in the world's enemy_shots pool
+                # and are dropped when this enemy is removed
+                shots.spawn(self.x, self.y, self.z + 20, bvx, bvy, 2000, owner=self)
     def move(self, dx, dy):
         self.x += dx; self.y += dy
-        for e in self.entities:
-            e.x += dx; e.y += dy; e.sync_bounding_box()
         self.sync_bounding_box()
-    def draw(self):
-        # Scale model about its center for pulsing visuals
-        glPushMatrix()
-        glTranslatef(self.x, self.y, self.z)
-        glScalef(self._pulse_scale, self._pulse_scale, self._pulse_scale)
-        glTranslatef(-self.x, -self.y, -self.z)
-        super().draw()
-        glPopMatrix()
-
-        if self.is_boss:
-            # draw projectiles as small spheres
-            glColor3f(1, 1, 0)
-            for b in self.projectiles:
-                glPushMatrix(); glTranslatef(b['x'], b['y'], b['z']); glScalef(5,5,5); gluSphere(Sphere.quadric,1,8,8); glPopMatrix()
+        if self.grid is not None: self.grid.update(self, self.x, self.y)
 
 class FastEnemy(Enemy):
-    def __init__(self, x, y, ground_z):
-        super().__init__(x, y, ground_z, False)
+    __slots__ = ()
+    def __init__(self, x, y, ground_z, rng=random):
+        super().__init__(x, y, ground_z, False, rng=rng)
         self.speed *= 20
 #Weaons and items
 
-class Bullet:
-    def __init__(self, x, y, z, vx, vy, dmg, max_dist=800):
-        self.x=x; self.y=y; self.z=z
-        self.vx=vx; self.vy=vy
-        self.dmg=dmg
-        self.dist=0
-        self.max_dist=max_dist
-    def update(self):
-        self.x += self.vx; self.y += self.vy
-        self.dist += math.hypot(self.vx, self.vy)
-        return self.dist < self.max_dist
-    def draw(self):
-        glColor3f(*get_color('red'))
-        glPushMatrix(); glTranslatef(self.x, self.y, self.z); glScalef(6,6,6); gluSphere(Sphere.quadric,1,8,8); glPopMatrix()
+# Bullets and enemy shots live in projectiles pools (see `bullets` and
+# `enemy_shots` below) and are drawn as 8x8 spheres from Shape3D's mesh cache
 
 class Portal:
+    __slots__ = ('active', 'x', 'y', 'z', 'normal', 'color')
     def __init__(self, color_name):
         self.active=False
         self.x=0; self.y=0; self.z=20
@@ -763,7 +922,8 @@ class Portal:
         # draw flat cylinder (ellipse look by non-uniform scale)
         glRotatef(90,1,0,0)
         glScalef(1.6, 1.0, 1.0)
-        gluCylinder(Sphere.quadric, 20, 20, 2, 24, 1)
+        glScalef(20, 20, 2)
+        Shape3D.draw_mesh('cylinder', 24, 1)
         glPopMatrix()
 
 # Camera
@@ -781,30 +941,158 @@ class Cam3rd:
                 self.cen_x, self.cen_y, self.cen_z,
                 self.up_x,  self.up_y,  self.up_z)
 
+class LevelContent:
+    # Everything setup_level() builds for one level. A level is staged into
+    # one of these (possibly on the preload thread) and installed by pointing
+    # the world's level attributes at its containers, see install_level()
+    __slots__ = ('level', 'floor', 'walls', 'obstacles', 'world_bounds',
+                 'enemies', 'chests', 'key_positions', 'enemy_grid', 'chest_grid', 'key_grid',
+                 'checkpoint_tiles', 'exit_tiles', 'lava_tiles', 'golden_tiles',
+                 'triggers', 'player_start', 'portals', 'start_msg', 'static_plan')
+
+    def __init__(self, level):
+        self.level = level
+        self.floor = Box('toothpaste', 0, 0, GRID_Z/2, 0,0,0, 1000, 1000, GRID_Z)
+        self.walls = []; self.obstacles = []
+        self.world_bounds = None
+        self.enemies = []; self.chests = []; self.key_positions = []
+        self.enemy_grid = SpatialGrid(); self.chest_grid = SpatialGrid(); self.key_grid = SpatialGrid()
+        self.checkpoint_tiles = []; self.exit_tiles = []; self.lava_tiles = []; self.golden_tiles = []
+        self.triggers = {}        # golden-tile triggers: id -> {'message', 'spawn'}
+        self.player_start = None  # (x, y), or None to start at the origin
+        self.portals = []         # [(color, x, y, z)]
+        self.start_msg = None
+        self.static_plan = None   # see static_layer_plan()
+
+    def add_enemy(self, e):
+        self.enemies.append(e)
+        self.enemy_grid.insert(e, e.x, e.y)
+        e.grid = self.enemy_grid
+
+    def add_chest(self, c):
+        self.chests.append(c)
+        self.chest_grid.insert(c, c.x, c.y)
+
+    def add_key(self, x, y):
+        k = (x, y)
+        self.key_positions.append(k)
+        self.key_grid.insert(k, x, y)
+
 #GAme state
 
-floor = Box('toothpaste', 0, 0, GRID_Z/2, 0,0,0, 1000, 1000, GRID_Z)
-player = StickPlayer(0, 0, GRID_Z, 0)
-cam1 = Cam3rd(50, -200, 200, 0,0,0, 0,0,1)
-
-# enemies, chests, keys, pickups
-enemies = []
-chests = []
-key_positions = [] 
-pickups = []  
-walls = []    
-world_bounds = None  
-
-# Level 3 trap configuration
-TRAP_MSG = "Oops, it was a trap. Now brace yourself!"
-level3_trap_boss_spawned = False
-
-# gameplay
-paused = True
-menu_mode = 'title' 
-score = 0
-start_time = None
-best_score = 0
+class World:
+    # One game session: the installed level, the player, projectiles,
+    # portals, score, checkpoints, messages and trap flags, and the RNG the
+    # simulation draws from. Update and draw functions take the world as
+    # their first argument, so several worlds can be simulated side by side
+    # in one process; the GLUT window plays the module's `world`.
+    #
+    # The level attributes (floor, walls, obstacles, world_bounds, the tile
+    # lists, level_triggers, enemies, chests, key_positions and their grids)
+    # alias the containers of level_content and are rebound together by
+    # install_level().
+    #
+    # Randomness: the simulation draws only from rng, and each level's layout
+    # from level_rng(w, level), a stream derived from run_seed and the level
+    # number (so it is the same whether the level was preloaded or built on
+    # the spot). After set_seed(), the same inputs replay the same ticks; with
+    # hash_ticks set, tick() records state_hash() in tick_hashes to check that
+    # two runs agree
+    def __init__(self, seed=None):
+        self.run_seed = random.randrange(2**32) if seed is None else seed
+        self.rng = random.Random(self.run_seed)
+        self.hash_ticks = False
+        self.tick_hashes = []
+        self.preload_job = None  # LevelPreload of the level being staged
+
+        # installed level, and its static layer compiled to display lists
+        self.static_batches = []    # [(aabb, list id)] in paint order
+        self.obstacle_batches = []  # same, painted after the entities
+        install_level(self, LevelContent(0))  # also sets static_plan, static_layer_dirty
+
+        self.player = StickPlayer(0, 0, GRID_Z, 0)
+        self.moving = {'w': False, 'a': False, 's': False, 'd': False}  # held movement keys
+        self.yaw_step = yaw_step_values[0]
+        self.pickups = []
+        self.pickup_grid = SpatialGrid()
+        # bullets: fixed-capacity structure-of-arrays pool
+        self.bullets = BulletPool(1024)
+        # enemy (boss/turret) shots, independent of the enemy that fired them
+        self.enemy_shots = EnemyShotPool(512)
+        # portals
+        self.blue_portal = Portal('cyan')
+        self.red_portal = Portal('red')
+        self.portal_toggle = True  # the portal gun places blue next
+
+        # gameplay
+        self.paused = True
+        self.menu_mode = 'title'
+        self.score = 0
+        self.best_score = 0
+        self.start_time = None
+        # checkpoints
+        self.checkpoints = []
+        self.last_checkpoint = None
+        self.load_uses_left = 3
+        # level
+        self.current_level = 1
+        self.boss_spawned = False
+        self.boss_seen_alive = False
+        self.win_check_cooldown = 0
+        self.trap_triggered = False
+        self.level3_trap_boss_spawned = False
+
+        # HUD messages
+        self.lava_msg = ""
+        self.lava_msg_timer = 0
+        self.checkpoint_msg = 0
+        self.golden_tile_msg = ""
+        self.golden_tile_msg_timer = 0
+        # level 1 tutorials
+        self.level1_start_msg = ""
+        self.level1_msg_active = False
+        self.level1_checkpoint_msg = ""
+        self.level1_checkpoint_msg_active = False
+        self.level1_enemy_stat = 0
+        self.level1_all_enemies_msg = ""
+        self.level1_all_enemies_msg_active = False
+        self.level1_enemies_spawned = False  # Track if the 5 enemies have been spawned
+        self.once = 0
+
+    # Keep the entity lists and their spatial indexes in sync
+    def add_enemy(self, e):
+        self.enemies.append(e)
+        self.enemy_grid.insert(e, e.x, e.y)
+        e.grid = self.enemy_grid
+        return e
+
+    def remove_enemy(self, e):
+        self.enemies.remove(e)
+        self.enemy_grid.remove(e)
+        e.grid = None
+        self.enemy_shots.kill_owners((e,))  # an enemy's shots go with it
+
+    def remove_enemies(self, gone):
+        # Bulk removal with one list rebuild instead of a list.remove per enemy
+        for e in gone:
+            self.enemy_grid.remove(e)
+            e.grid = None
+        self.enemy_shots.kill_owners(gone)
+        gone = set(map(id, gone))
+        self.enemies[:] = [e for e in self.enemies if id(e) not in gone]
+
+    def add_chest(self, c):
+        self.chests.append(c)
+        self.chest_grid.insert(c, c.x, c.y)
+
+    def add_key(self, x, y):
+        k = (x, y)
+        self.key_positions.append(k)
+        self.key_grid.insert(k, x, y)
+
+    def add_pickup(self, p):
+        self.pickups.append(p)
+        self.pickup_grid.insert(p, p['x'], p['y'])
 
 inventory_slots = {
     1: 'handgun',
@@ -815,33 +1103,32 @@ inventory_slots = {
     6: 'shard'
 }
 
-selected_slot = 1
-
-# bullets
-bullets = []
-
-# portals
-blue_portal = Portal('cyan')
-red_portal  = Portal('red')
-
 # scope
 scoped = False
 pre_scope_camera_mode = cam_third
 
-# checkpoints
-checkpoints = []
-last_checkpoint = None
-load_uses_left = 3
+report_memory = False  # print memory_report() after every setup_level()
+
+#Profiling: F9 (or launching with --profile [FRAMES]) records profile_frames
+#frames with per-phase timings, see profiling.py
+profile_frames = 120
+PROFILE_DIR = 'profiles'
+
+#Background preloading: once a level is set up, the next one is staged
+#(entities and static-layer plan, no GL calls) on a worker thread, so
+#reaching the exit only has to install it. Staged and foreground builds
+#both draw from level_rng(), so turning this off changes timing, not layouts
+preload_enabled = True
+PRELOAD_EXIT_RADIUS = 600.0  # also start it once the player is this close to an exit
 
-# level
-current_level = 1
-boss_spawned = False
-boss_seen_alive = False
-win_check_cooldown = 0
+#Startup: ms from the start of `import main` to the end of the first
+#display(); printed when launched with --startup
+first_frame_ms = None
+report_startup = False
 
 
 
-def camera():
+def camera(w):
     global cam_eye, cam_cen
     glMatrixMode(GL_MODELVIEW)
     glLoadIdentity()
@@ -852,296 +1139,345 @@ def camera():
     gluPerspective(fovY, aspect_ratio, 0.1, 5000)
     glMatrixMode(GL_MODELVIEW)
 
+    # follow the interpolated player position, not the last simulated tick
+    global view_eye, view_frustum, lod_pixels_per_unit
+    lod_pixels_per_unit = (window_height / 2) / math.tan(math.radians(fovY) / 2)
+    ox, oy, oz = interp_offset(w.player)
     if camera_mode == cam_third:
         # follow player with planar offsets relative to yaw, z locked
-        yaw_rad = math.radians(player.yaw)
+        yaw_rad = math.radians(w.player.yaw)
         fx, fy = math.cos(yaw_rad), math.sin(yaw_rad)  # forward
         rx, ry = -math.sin(yaw_rad), math.cos(yaw_rad) # right
+        px, py, pz = w.player.x + ox, w.player.y + oy, w.player.z + oz
         des_eye = (
-            player.x - fx*third_cam_back + rx*third_cam_side,
-            player.y - fy*third_cam_back + ry*third_cam_side,
-            player.z + third_cam_height
+            px - fx*third_cam_back + rx*third_cam_side,
+            py - fy*third_cam_back + ry*third_cam_side,
+            pz + third_cam_height
         )
-        des_cen = (player.x, player.y, player.z+40)
+        des_cen = (px, py, pz+40)
         # initialize smoothing targets
         if cam_eye is None: cam_eye = list(des_eye)
         if cam_cen is None: cam_cen = list(des_cen)
-        # smooth follow (LERP)
-        cam_eye[0] += (des_eye[0]-cam_eye[0])*camera_smooth
-        cam_eye[1] += (des_eye[1]-cam_eye[1])*camera_smooth
-        cam_eye[2] += (des_eye[2]-cam_eye[2])*camera_smooth
-        cam_cen[0] += (des_cen[0]-cam_cen[0])*(camera_smooth*1.2)
-        cam_cen[1] += (des_cen[1]-cam_cen[1])*(camera_smooth*1.2)
-        cam_cen[2] += (des_cen[2]-cam_cen[2])*(camera_smooth*1.2)
+        # smooth follow (LERP), rescaled so the follow speed is per sim tick
+        # rather than per rendered frame
+        k_eye = 1 - (1 - camera_smooth) ** (frame_dt * SIM_HZ)
+        k_cen = 1 - (1 - camera_smooth*1.2) ** (frame_dt * SIM_HZ)
+        cam_eye[0] += (des_eye[0]-cam_eye[0])*k_eye
+        cam_eye[1] += (des_eye[1]-cam_eye[1])*k_eye
+        cam_eye[2] += (des_eye[2]-cam_eye[2])*k_eye
+        cam_cen[0] += (des_cen[0]-cam_cen[0])*k_cen
+        cam_cen[1] += (des_cen[1]-cam_cen[1])*k_cen
+        cam_cen[2] += (des_cen[2]-cam_cen[2])*k_cen
         gluLookAt(cam_eye[0],cam_eye[1],cam_eye[2], cam_cen[0],cam_cen[1],cam_cen[2], 0,0,1)
+        view_eye = tuple(cam_eye); view_cen = tuple(cam_cen); view_up = (0, 0, 1)
     elif camera_mode == cam_first:
         # first person from head (no smoothing for responsiveness)
-        head = player.head_entity()
-        ex,ey,ez = head.x, head.y, head.z
-        dx = math.cos(math.radians(player.yaw))
-        dy = math.sin(math.radians(player.yaw))
+        hx, hy, hz = w.player.part_position(w.player.head_entity())
+        ex,ey,ez = hx + ox, hy + oy, hz + oz
+        dx = math.cos(math.radians(w.player.yaw))
+        dy = math.sin(math.radians(w.player.yaw))
         cam_eye = None; cam_cen = None  # reset smoothing when switching back later
         gluLookAt(ex,ey,ez, ex+dx*50, ey+dy*50, ez, 0,0,1)
+        view_eye = (ex, ey, ez); view_cen = (ex+dx*50, ey+dy*50, ez); view_up = (0, 0, 1)
     elif camera_mode == cam_topdown:
         gluLookAt(0, 0, 2500, 0, 0, 0, 1, 0, 0)
+        view_eye = (0, 0, 2500); view_cen = (0, 0, 0); view_up = (1, 0, 0)
+    else:
+        return
+    view_frustum = Frustum(view_eye, view_cen, view_up, fovY, aspect_ratio, 0.1, 5000)
 
 # --------------------------- Level Setup ----------------------
 
-def clear_level():
-    enemies.clear(); chests.clear(); key_positions.clear(); pickups.clear(); walls.clear(); obstacles.clear()
-    bullets.clear(); blue_portal.active=False; red_portal.active=False
-    checkpoints.clear()
-    globals()['world_bounds'] = None
-    checkpoint_tiles.clear()
-    exit_tiles.clear()
-    lava_tiles.clear()
-    golden_tiles.clear()
-    globals()['level3_trap_boss_spawned'] = False
-
-def setup_level(level):
-    global current_level, last_checkpoint, start_time, boss_spawned, boss_seen_alive, win_check_cooldown, level1_start_msg, level1_msg_active, obstacles
-    current_level = level
-    clear_level()
-    boss_spawned = False
-    boss_seen_alive = False
-    win_check_cooldown = 120  # frames to wait before evaluating win
+def clear_level(w):
+    w.enemies.clear(); w.chests.clear(); w.key_positions.clear(); w.pickups.clear(); w.walls.clear(); w.obstacles.clear()
+    w.enemy_grid.clear(); w.chest_grid.clear(); w.key_grid.clear(); w.pickup_grid.clear()
+    w.bullets.clear(); w.enemy_shots.clear(); w.blue_portal.active=False; w.red_portal.active=False
+    w.checkpoints.clear()
+    w.world_bounds = w.level_content.world_bounds = None
+    w.checkpoint_tiles.clear()
+    w.exit_tiles.clear()
+    w.lava_tiles.clear()
+    w.golden_tiles.clear()
+    invalidate_static_layer(w)
+    w.level3_trap_boss_spawned = False
+
+def setup_level(w, level):
+    # tiles, chests, enemies and triggers come from levels/level<N>.json,
+    # usually staged already by the preloader
+    content = take_preloaded_level(w, level) or stage_level(level, level_rng(w, level))
+    w.current_level = level
+    clear_level(w)
+    w.boss_spawned = False
+    w.boss_seen_alive = False
+    w.win_check_cooldown = 120  # frames to wait before evaluating win
     # place player at origin
-    place_player(0,0)
-    player.inventory['portalgun'] = 1 if level>=1 else 0  # L1 finds it in a chest
-    player.inventory['keys'] = 3 if level==1 else 0
-    player.health = 100; player.damage = 10
+    place_player(w, 0,0)
+    w.player.inventory['portalgun'] = 1 if level>=1 else 0  # L1 finds it in a chest
+    w.player.inventory['keys'] = 3 if level==1 else 0
+    w.player.health = 100; w.player.damage = 10
     # checkpoints
-    checkpoints.extend([(-200,-200), (0,0), (300,200)])
-    last_checkpoint = (0,0)
-    # keys scattered
-    # Level 2: a few random keys around the origin
-    if level == 2:
-        for _ in range(3):
-            key_positions.append((random.randint(-300,300), random.randint(-300,300)))
-    # chests
-    if level > 1:
-        for i in range(2 if level==1 else 3):
-            cx = random.randint(-250,250); cy = random.randint(-250,250)
-            c = Chest(cx, cy, GRID_Z)
-            c.contains = random.choice(['ammo', 'rifle_ammo', 'Nourishment','Aegis','Shard','portalgun'])
-            chests.append(c)
-    # enemies
-    if level==1:
-        field_size = 1600
-        build_level3_bounds(field_size, 2000)
-        place_player(-field_size + 130, 100)
-        place_checkpoint_tile(-1500, -100)
-        level1_start_msg = "Walk over the green tile to set your checkpoint"
-        level1_msg_active = True
-        place_lava_tile(-1300, 100)
-        place_lava_tile(-1300, 300)
-        place_lava_tile(-1300, 500)
-        place_lava_tile(-1300, 700)
-        place_lava_tile(-1300, 900)
-        place_lava_tile(-1300, 1100)
-        place_lava_tile(-1300, 1300)
-        place_lava_tile(-1300, -100)
-        place_lava_tile(-1300, -300)
-        place_lava_tile(-1300, -500)
-        place_lava_tile(-1300, -700)
-        place_lava_tile(-1300, -900)
-        place_lava_tile(-1300, -1100)
-        place_lava_tile(-1300, -1300)
-        place_golden_tile(-1500, -1500, "On to the next one!")
-        place_golden_tile(-1100, -1500, "Next one it is!")
-        place_lava_tile(-900, -1500)
-        place_lava_tile(-900, -1300)
-        place_lava_tile(-900, -1100)
-        place_lava_tile(-900, -900)
-        place_lava_tile(-900, -700)
-        place_lava_tile(-900, -500)
-        place_lava_tile(-900, -300)
-        place_lava_tile(-900, -100)
-        place_lava_tile(-900, 100)
-        place_lava_tile(-1100, 100)
-        place_golden_tile(-1100, -100, 'Oh! No road ahead! Press "C" to go back to the checkpoint')
-        place_lava_tile(100, 100)
-        place_lava_tile(100, 300)
-        place_lava_tile(100, 500)
-        place_lava_tile(100, 700)
-        place_lava_tile(100, 900)
-        place_lava_tile(100, 1100)
-        place_lava_tile(100, 1300)
-        place_lava_tile(100, 1500)
-        place_lava_tile(100, -100)
-        place_lava_tile(100, -300)
-        place_lava_tile(100, -500)
-        place_lava_tile(100, -700)
-        place_lava_tile(100, -900)
-        place_lava_tile(100, -1100)
-        place_lava_tile(100, -1300)
-
-        place_lava_tile(1300, -1500)
-        place_lava_tile(1300, -1300)
-        place_lava_tile(1300, -1100)
-        place_lava_tile(1300, -900)
-        place_lava_tile(1300, -700)
-        place_lava_tile(1300, -500)
-        place_lava_tile(1300, -300)
-        place_lava_tile(1300, -100)
-        place_lava_tile(1300, 100)
-        place_lava_tile(1300, 300)
-        place_lava_tile(1300, 500)
-        place_lava_tile(1300, 700)
-        place_lava_tile(1300, 900)
-        place_lava_tile(1300, 1100)
-        place_lava_tile(1300, 1300)
-        place_exit_tile(1500, -1500)
-        red_portal.place(1500, -1300, 20)
-        place_golden_tile(-1300, 1500, "Uh oh!!! A trap. Use the Rifle for longer range.")
-        place_golden_tile(100, -1500, "Muahaha!!! Even bigger trap!")
-        place_golden_tile(1300, 1500, "Yay!!!")
-        place_golden_tile(1500, -700, "Oh no! Road blocked!!! Use the portal gun!!!")
-        place_golden_tile(1500, -1300, "Yay!!! Step onwards to proceed to level 2")
-        a = Chest(100, -1500, GRID_Z)
-        a.contains = random.choice(['ammo', 'rifle_ammo'])
-        b = Chest(-1300, 1500, GRID_Z)
-        b.contains = random.choice(['ammo', 'rifle_ammo'])
-        chests.append(a)
-        chests.append(b)
-    elif level==2:
-        field_size = 800
-        place_golden_tile(100, 700, "Oh no they're fast")
-        obstacles.append(Box('red', 300, 700, GRID_Z+100, 0, 0, 0, 200, 200, 200))
-        build_level3_bounds(field_size)
-        
-    else:
-        field_size = 1600
-        for i in range(8):
-            enemies.append(Enemy(random.randint(-field_size,field_size), random.randint(-field_size,field_size), GRID_Z, False))
-        # Place boss near a corner
-        enemies.append(Enemy(field_size-100, field_size-100, GRID_Z, True))
-        # Fallback: ensure there's at least one boss; if not, spawn one near origin
-        if not any(e.is_boss for e in enemies):
-            enemies.append(Enemy(180,0, GRID_Z, True))
-        for e in enemies:
-            if getattr(e, 'is_boss', False):
-                e.speed = 0.8
-        boss_spawned = any(e.is_boss for e in enemies)
-        build_level3_bounds(field_size)
-
-        pad_cp = 200
-        cp_positions = [
-            (-field_size+pad_cp, -field_size+pad_cp),
-            ( field_size-pad_cp, -field_size+pad_cp),
-            (-field_size+pad_cp,  field_size-pad_cp),
-            ( field_size-pad_cp,  field_size-pad_cp),
-        ]
-        for (cx, cy) in cp_positions:
-            place_checkpoint_tile(cx, cy)
-
-        # Two entire rows and two entire columns of lava across the arena grid
-        wb = globals().get('world_bounds')
-        if wb:
-            tile = 200
-            x_start = int(math.floor(wb['min_x']/tile))*tile
-            x_end   = int(math.ceil(wb['max_x']/tile))*tile
-            y_start = int(math.floor(wb['min_y']/tile))*tile
-            y_end   = int(math.ceil(wb['max_y']/tile))*tile
-            row_ys = [-400, 400]
-            col_xs = [-400, 400]
-            for y in row_ys:
-                if y < wb['min_y'] or y > wb['max_y']:
-                    continue
-                for x in range(x_start, x_end+1, tile):
-                    place_lava_tile(x, y)
-            for x in col_xs:
-                if x < wb['min_x'] or x > wb['max_x']:
-                    continue
-                for y in range(y_start, y_end+1, tile):
-                    place_lava_tile(x, y)
-
-            # GoldenTile trap row moved off-center so the player walks into it (y=800)
-            trap_y = 800
-            if trap_y >= wb['min_y'] and trap_y <= wb['max_y']:
-                for x in range(x_start, x_end+1, tile):
-                    place_golden_tile(x, trap_y, TRAP_MSG)
-
-            # Make the 9 tiles in the exact center a 3x3 lava cluster
-            center_coords = [-200, 0, 200]
-            for cx in center_coords:
-                for cy in center_coords:
-                    if cx >= wb['min_x'] and cx <= wb['max_x'] and cy >= wb['min_y'] and cy <= wb['max_y']:
-                        place_lava_tile(cx, cy)
-
-        wb = globals().get('world_bounds')
-        if wb:
-            def clamp2(v, lo, hi):
-                return max(lo, min(hi, v))
-            boss_x = field_size - 100
-            boss_y = field_size - 100
-            around = [(-200, 0), (0, -200), (-200, -200), (-100, -100)]
-            for ox, oy in around:
-                px = clamp2(boss_x + ox, wb['min_x']+100, wb['max_x']-100)
-                py = clamp2(boss_y + oy, wb['min_y']+100, wb['max_y']-100)
-                place_lava_tile(px, py)
-        pad = 80
-        for i in range(len(chests)):
-            kx = random.randint(-field_size+pad, field_size-pad)
-            ky = random.randint(-field_size+pad, field_size-pad)
-            key_positions.append((kx, ky))
+    w.checkpoints.extend([(-200,-200), (0,0), (300,200)])
+    w.last_checkpoint = (0,0)
+    install_level(w, content)
+    if content.player_start:
+        place_player(w, *content.player_start)
+    for color, x, y, z in content.portals:
+        (w.red_portal if color == 'red' else w.blue_portal).place(x, y, z)
+    if content.start_msg is not None:
+        w.level1_start_msg = content.start_msg
+        w.level1_msg_active = True
+    w.boss_spawned = any(e.is_boss for e in w.enemies)
     # timer/score
-    start_time = time.time()
+    w.start_time = time.time()
+    preload_level(w, level + 1)
+
+    if report_memory:
+        print(memory_report(w))
+
+def set_seed(w, seed):
+    # Make the run repeatable from here on; a level staged with the old seed
+    # is dropped
+    w.run_seed = seed
+    w.rng.seed(seed)
+    w.preload_job = None
+
+def level_rng(w, level):
+    # Fresh RNG for building one level, derived from the run seed
+    return random.Random(f"{w.run_seed}/level{level}")
+
+def stage_level(level, rng):
+    # Build a level into a new LevelContent without touching the installed
+    # level or GL, so this is safe on the preload thread
+    content = LevelContent(level)
+    build_level(content, levelfile.load_level(level), rng)
+    content.static_plan = static_layer_plan(content)
+    return content
+
+def install_level(w, content):
+    # Make a staged level current by rebinding the world's level attributes
+    # to its containers; nothing is copied
+    c = w.level_content = content
+    w.floor, w.walls, w.obstacles, w.world_bounds = c.floor, c.walls, c.obstacles, c.world_bounds
+    w.checkpoint_tiles, w.exit_tiles, w.lava_tiles, w.golden_tiles = c.checkpoint_tiles, c.exit_tiles, c.lava_tiles, c.golden_tiles
+    w.level_triggers = c.triggers
+    w.enemies, w.chests, w.key_positions = c.enemies, c.chests, c.key_positions
+    w.enemy_grid, w.chest_grid, w.key_grid = c.enemy_grid, c.chest_grid, c.key_grid
+    # the display lists are compiled from the staged plan on the next frame
+    w.static_plan = c.static_plan
+    w.static_layer_dirty = True
+
+class LevelPreload:
+    # Stages one level on a daemon thread. It rolls its random placements
+    # from the level's own RNG (level_rng()), never from the world's rng
+    def __init__(self, level, rng):
+        self.level = level
+        self.content = None
+        self.thread = threading.Thread(target=self.run, args=(rng,), daemon=True)
+        self.thread.start()
+
+    def run(self, rng):
+        try:
+            with profiling.scope(f'stage_level {self.level}'):
+                self.content = stage_level(self.level, rng)
+        except Exception:
+            # leave content unset; setup_level() then builds the level on the
+            # main thread, where the error surfaces normally
+            pass
+
+    def take(self):
+        # Staged content, waiting for the thread if it has not finished yet
+        self.thread.join()
+        return self.content
 
-def build_level3_bounds(field_size, wall_height = 800):
+def preload_level(w, level):
+    # Start staging a level in the background unless it already is
+    if not preload_enabled or not levelfile.level_exists(level):
+        return
+    if w.preload_job is not None and w.preload_job.level == level:
+        return
+    w.preload_job = LevelPreload(level, level_rng(w, level))
+
+def take_preloaded_level(w, level):
+    # The preloaded content for level, or None if it was not preloaded
+    job = w.preload_job
+    if job is None or job.level != level:
+        return None
+    w.preload_job = None
+    return job.take()
+
+def build_level(c, data, rng):
+    # Replay the compiled level records (see levelfile.py) in file order
+    # into LevelContent c
+    field_size = 0
+    for kind, x, y, z, w, d, h, a, b in data:
+        if kind == 'random_keys':
+            r = int(y)
+            for _ in range(int(x)):
+                c.add_key(rng.randint(-r,r), rng.randint(-r,r))
+        elif kind == 'random_chests':
+            r = int(y)
+            for _ in range(int(x)):
+                cx = rng.randint(-r,r); cy = rng.randint(-r,r)
+                chest = Chest(cx, cy, GRID_Z)
+                chest.contains = rng.choice(a.split('|'))
+                c.add_chest(chest)
+        elif kind == 'bounds':
+            field_size = int(x)
+            build_level3_bounds(c, field_size, h)
+        elif kind == 'player':
+            c.player_start = (x, y)
+        elif kind == 'start_message':
+            c.start_msg = a
+        elif kind == 'trigger':
+            c.triggers[a] = {'message': b, 'spawn': []}
+        elif kind == 'trigger_spawn':
+            c.triggers[a]['spawn'].append((x, y))
+        elif kind == 'checkpoint':
+            c.checkpoint_tiles.append(CheckpointTile(x, y))
+        elif kind == 'lava':
+            c.lava_tiles.append(LavaTile(x, y))
+        elif kind == 'golden':
+            c.golden_tiles.append(GoldenTile(x, y, GRID_Z, c.triggers[a]['message'], a))
+        elif kind == 'exit':
+            c.exit_tiles.append(LevelExitTile(x, y))
+        elif kind == 'portal':
+            c.portals.append((a, x, y, z))
+        elif kind == 'chest':
+            chest = Chest(x, y, GRID_Z)
+            chest.contains = rng.choice(a.split('|'))
+            c.add_chest(chest)
+        elif kind == 'obstacle':
+            # z is the centre height above the floor
+            c.obstacles.append(Box(a, x, y, GRID_Z+z, 0, 0, 0, w, d, h))
+        elif kind == 'random_enemies':
+            for i in range(int(x)):
+                c.add_enemy(Enemy(rng.randint(-field_size,field_size), rng.randint(-field_size,field_size), GRID_Z, a == 'boss', rng=rng))
+        elif kind == 'enemy':
+            c.add_enemy(Enemy(x, y, GRID_Z, a == 'boss', rng=rng))
+        elif kind == 'keys_per_chest':
+            pad = int(x)
+            for i in range(len(c.chests)):
+                kx = rng.randint(-field_size+pad, field_size-pad)
+                ky = rng.randint(-field_size+pad, field_size-pad)
+                c.add_key(kx, ky)
+
+def instance_bytes(obj):
+    # Shallow size of one object, including its __dict__ if it has one
+    d = getattr(obj, '__dict__', None)
+    return sys.getsizeof(obj) + (sys.getsizeof(d) if d is not None else 0)
+
+def level_objects(w):
+    # Every entity-like object the current level holds, parts included
+    objs = [w.player, w.floor, w.blue_portal, w.red_portal]
+    objs += w.checkpoint_tiles + w.exit_tiles + w.lava_tiles + w.golden_tiles + w.walls + w.obstacles
+    objs += w.chests + w.enemies
+    for c in [w.player] + w.chests + w.enemies:
+        objs += c.entities
+    return objs
+
+def memory_report(w):
+    # Bytes per entity type and in total for the current level (object
+    # headers and attribute storage; shared values like colors not counted)
+    rows = {}
+    for obj in level_objects(w):
+        n, b = rows.get(type(obj).__name__, (0, 0))
+        rows[type(obj).__name__] = (n + 1, b + instance_bytes(obj))
+    lines = [f"Level {w.current_level} entity memory:"]
+    for name, (n, b) in sorted(rows.items(), key=lambda r: -r[1][1]):
+        lines.append(f"  {name:15s} {n:5d} x {b/n:6.0f} B = {b:8d} B")
+    total = sum(b for n, b in rows.values())
+    lines.append(f"  {'total':15s} {sum(n for n, b in rows.values()):5d}            {total:8d} B")
+    lines.append(f"  projectile pools {pool_bytes(w.bullets) + pool_bytes(w.enemy_shots):8d} B")
+    return "\n".join(lines)
+
+def pool_bytes(pool):
+    return sum(a.nbytes for a in vars(pool).values() if isinstance(a, np.ndarray))
+
+def build_level3_bounds(c, field_size, wall_height = 800):
     # Set floor to cover entire field in grass green
-    global floor
     size = (field_size + 150) * 2  # a bit larger than field for coverage
     # base floor set to a dark wood tone; tiles will be drawn on top
-    floor = Box('dark_brown', 0, 0, GRID_Z/2, 0,0,0, size, size, GRID_Z)
+    c.floor = Box('dark_brown', 0, 0, GRID_Z/2, 0,0,0, size, size, GRID_Z)
     # Build four tall mahogany walls bordering the field
     wall_thick = 20
     wall_height = wall_height
     half = field_size
     zc = GRID_Z + wall_height/2
     # Left and right walls (parallel to Y axis)
-    walls.append(Box('mahogany', -half-wall_thick/2, 0, zc, 0,0,0, wall_thick, half*2 + wall_thick*2, wall_height))
-    walls.append(Box('mahogany',  half+wall_thick/2, 0, zc, 0,0,0, wall_thick, half*2 + wall_thick*2, wall_height))
+    c.walls.append(Box('mahogany', -half-wall_thick/2, 0, zc, 0,0,0, wall_thick, half*2 + wall_thick*2, wall_height))
+    c.walls.append(Box('mahogany',  half+wall_thick/2, 0, zc, 0,0,0, wall_thick, half*2 + wall_thick*2, wall_height))
     # Bottom and top walls (parallel to X axis)
-    walls.append(Box('mahogany', 0, -half-wall_thick/2, zc, 0,0,0, half*2 + wall_thick*2, wall_thick, wall_height))
-    walls.append(Box('mahogany', 0,  half+wall_thick/2, zc, 0,0,0, half*2 + wall_thick*2, wall_thick, wall_height))
+    c.walls.append(Box('mahogany', 0, -half-wall_thick/2, zc, 0,0,0, half*2 + wall_thick*2, wall_thick, wall_height))
+    c.walls.append(Box('mahogany', 0,  half+wall_thick/2, zc, 0,0,0, half*2 + wall_thick*2, wall_thick, wall_height))
     # Set playable bounds to inside the walls
-    globals()['world_bounds'] = {'min_x': -half, 'max_x': half, 'min_y': -half, 'max_y': half}
+    c.world_bounds = {'min_x': -half, 'max_x': half, 'min_y': -half, 'max_y': half}
 
 # --------------------------- Player Helpers -------------------
 
-def place_player(x,y):
-    dx = x - player.x
-    dy = y - player.y
-    player.move(dx,dy)
+def place_player(w, x,y):
+    dx = x - w.player.x
+    dy = y - w.player.y
+    w.player.move(dx,dy)
+    w.player.save_prev()  # teleport: don't interpolate across the jump
 
-def apply_pickup(name):
+def apply_pickup(w, name):
     if name=='ammo':
-        player.inventory['handgun_ammo'] += 12
+        w.player.inventory['handgun_ammo'] += 12
     elif name == 'rifle_ammo':
-        player.inventory['rifle_ammo'] += 6 
+        w.player.inventory['rifle_ammo'] += 6 
     elif name=='Nourishment':
-        player.health = clamp(player.health+25, 0, 100)
+        w.player.health = clamp(w.player.health+25, 0, 100)
     elif name=='Aegis':
-        player.inventory['Aegis'] += 1
+        w.player.inventory['Aegis'] += 1
     elif name=='Shard':
-        player.damage += 5
+        w.player.damage += 5
     elif name=='portalgun':
-        player.inventory['portalgun'] = 1
+        w.player.inventory['portalgun'] = 1
 
 # --------------------------- UI (2D) --------------------------
 
-def draw_inventory_bar():
+# The HUD is drawn inside one 2D window-pixel projection per frame
+# (begin_2d/end_2d in draw_hud). Widgets whose content changes rarely are
+# retained: each is baked into a display list from the state tuple it shows
+# and only re-baked when that tuple changes.
+
+def begin_2d():
     glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
     glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
+
+def end_2d():
+    glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
+
+class HudWidget:
+    def __init__(self, bake):
+        self.bake = bake    # bake(*state) issues the GL calls for one state
+        self.list = None
+        self.state = None   # state the list was last baked from
+        self.bakes = 0
+
+    def invalidate(self):
+        self.state = None
+
+    def draw(self, state):
+        if self.list is None:
+            self.list = glGenLists(1)
+        if state != self.state:
+            glNewList(self.list, GL_COMPILE)
+            self.bake(*state)
+            glEndList()
+            self.state = state
+            self.bakes += 1
+        glCallList(self.list)
+        perf_counters.add('draw calls')
+
+def bake_inventory_bar(names, selected):
     slot_w = 85; slot_h = 50; x0 = 20; y0 = 20
-    for i in range(1,10):
-        name = inventory_slots.get(i, '')
+    for i, name in enumerate(names, 1):
         if not name:
             continue
         x = x0 + (i-1)*(slot_w+1)
         y = y0
-        if i==selected_slot:
+        if i==selected:
             glColor3f(1,1,1)
         else:
             glColor3f(0.5,0.5,0.5)
@@ -1158,14 +1494,42 @@ def draw_inventory_bar():
         glEnd()
         draw_text(x+6, y+slot_h-18, str(i), (0, 0, 0))
         # item label
-        name = inventory_slots.get(i,'')
-        if name:
-            draw_text(x+20, y+20, name[:6], (0, 0, 0))
-    glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
+        draw_text(x+20, y+20, name[:6], (0, 0, 0))
+
+def bake_hud_stats(hp, ammo, rifle_ammo, keys, level, points):
+    text = f"HP: {hp}  Ammo: {ammo}  Rifle Ammo: {rifle_ammo}  Keys: {keys}  Level: {level}  Score: {points}"
+    draw_text(10, window_height - 24, text)
+
+def bake_text(x, y, text, color, centered):
+    if centered:
+        draw_text_centered(x, y, text, color)
+    else:
+        draw_text(x, y, text, color)
+
+def bake_message_box(half_w, y0, y1, text_y, text):
+    # Black box across the middle of the screen with centred white text
+    cx = window_width//2
+    glColor3f(0,0,0)
+    glBegin(GL_QUADS)
+    glVertex2f(cx-half_w, y0); glVertex2f(cx+half_w, y0); glVertex2f(cx+half_w, y1); glVertex2f(cx-half_w, y1)
+    glEnd()
+    draw_text_centered(cx, text_y, text, (1,1,1))
+
+hud_widgets = {
+    'inventory': HudWidget(bake_inventory_bar),
+    'stats': HudWidget(bake_hud_stats),
+    'lava': HudWidget(bake_text),
+    'checkpoint': HudWidget(bake_text),
+    'golden': HudWidget(bake_message_box),
+    'level1_start': HudWidget(bake_message_box),
+    'level1_checkpoint': HudWidget(bake_message_box),
+    'level1_all_enemies': HudWidget(bake_message_box),
+}
+
+def draw_inventory_bar(w):
+    hud_widgets['inventory'].draw((tuple(inventory_slots.get(i, '') for i in range(1, 10)), w.player.active_slot))
 
 def draw_crosshair(scoped_mode):
-    glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
-    glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
     cx, cy = window_width/2, window_height/2 - 21
     glColor3f(1,1,1)
     glBegin(GL_LINES)
@@ -1174,13 +1538,8 @@ def draw_crosshair(scoped_mode):
         glVertex2f(cx-200, cy); glVertex2f(cx+200, cy)
         glVertex2f(cx, cy-200); glVertex2f(cx, cy+200)
     glEnd()
-    glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
 
-def draw_radar():
-    # very simple 2D circle + dots around player showing nearby objects
-    glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
-    glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
-    cx, cy, R = window_width-110, 110, 90
+def bake_radar_frame(cx, cy, R):
     # circle approx
     glColor3f(1,1,1)
     glBegin(GL_LINE_LOOP)
@@ -1189,87 +1548,189 @@ def draw_radar():
         glVertex2f(cx + R*math.cos(a), cy + R*math.sin(a))
     glEnd()
     # player icon at center (small upward-pointing triangle)
-    glColor3f(1,1,1)
     glBegin(GL_TRIANGLES)
     glVertex2f(cx,     cy+8)
     glVertex2f(cx-6,   cy-4)
     glVertex2f(cx+6,   cy-4)
     glEnd()
-    # plot enemies/keys/chests within 400 units
-    def to_local(px,py):
-        dx = px - player.x; dy = py - player.y
-        d = math.hypot(dx,dy)
-        if d>400: return None
-        scale = R/400.0
-        # rotate by (90 - yaw) so player's forward faces up (north)
-        yaw_rad = math.radians(90 - player.yaw)
-        lx = dx*math.cos(yaw_rad) - dy*math.sin(yaw_rad)
-        ly = dx*math.sin(yaw_rad) + dy*math.cos(yaw_rad)
-        return (cx + lx*scale, cy + ly*scale)
-    glPointSize(5)
-    glBegin(GL_POINTS)
-    glColor3f(1,0,0)
-    for e in enemies:
-        p = to_local(e.x,e.y)
-        if p: glVertex2f(p[0],p[1])
-    glColor3f(1,1,0)
-    for kx,ky in key_positions:
-        p = to_local(kx,ky)
-        if p: glVertex2f(p[0],p[1])
-    glColor3f(0,1,1)
-    for c in chests:
-        p = to_local(c.x,c.y)
-        if p: glVertex2f(p[0],p[1])
-    glEnd()
-    glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
 
-def draw_hud_stats():
-    # Fixed-position HUD text in top-left corner using 2D orthographic projection
-    glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
-    glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
-    glColor3f(1,1,1)
-    x, y = 10, window_height - 24
-    text = f"HP: {int(player.health)}  Ammo: {player.inventory['handgun_ammo']}  Rifle Ammo: {player.inventory['rifle_ammo']}  Keys: {player.inventory['keys']}  Level: {current_level}  Score: {int(score)}"
-    glRasterPos2f(x, y)
-    font = globals().get('GLUT_BITMAP_HELVETICA_18', None)
-    if font is not None:
-        for ch in text:
-            glutBitmapCharacter(font, ord(ch))
+hud_widgets['radar'] = HudWidget(bake_radar_frame)
 
-    glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
+RADAR_RANGE = 400.0
+radar_blip_colors = ((1,0,0), (1,1,0), (0,1,1))  # enemies, keys, chests
+
+def draw_radar(w):
+    # very simple 2D circle + dots around player showing nearby objects
+    cx, cy, R = window_width-110, 110, 90
+    hud_widgets['radar'].draw((cx, cy, R))
+    # Blips for enemies/keys/chests: candidates from the grid cells around the
+    # player, then one vectorized pass does the range test and the rotation
+    # that puts the player's forward up (north)
+    pts = []; cols = []
+    for grid, color in zip((w.enemy_grid, w.key_grid, w.chest_grid), radar_blip_colors):
+        near = grid.points_near(w.player.x, w.player.y, RADAR_RANGE)
+        pts += near; cols += [color] * len(near)
+    if not pts:
+        return
+    d = np.array(pts) - (w.player.x, w.player.y)
+    keep = (d*d).sum(axis=1) < RADAR_RANGE*RADAR_RANGE
+    if not keep.any():
+        return
+    yaw_rad = math.radians(90 - w.player.yaw)
+    c, s = math.cos(yaw_rad), math.sin(yaw_rad)
+    rot = np.array([[c, s], [-s, c]]) * (R / RADAR_RANGE)
+    verts = (d[keep] @ rot + (cx, cy)).astype(np.float32)
+    colors = np.array(cols, np.float32)[keep]
+    glPointSize(5)
+    glEnableClientState(GL_VERTEX_ARRAY); glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(2, GL_FLOAT, 0, verts)
+    glColorPointer(3, GL_FLOAT, 0, colors)
+    glDrawArrays(GL_POINTS, 0, len(verts))
+    glDisableClientState(GL_COLOR_ARRAY); glDisableClientState(GL_VERTEX_ARRAY)
+    perf_counters.add('draw calls')
+
+def draw_hud_stats(w):
+    # Fixed-position HUD text in top-left corner
+    inv = w.player.inventory
+    hud_widgets['stats'].draw((int(w.player.health), inv['handgun_ammo'], inv['rifle_ammo'], inv['keys'], w.current_level, int(w.score)))
     # Draw lava message in top-right corner if active
-    if globals().get('lava_msg_timer', 0) > 0 and globals().get('lava_msg', ""):
-        glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
-        glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
-        draw_text(window_width - 320, window_height - 60, lava_msg, (1, 0.3, 0))
-        glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
-
-    if globals().get('checkpoint_msg', 0) > 0:
-        draw_text(window_width//2 - 80, window_height//2 + 80, "Checkpoint Saved!")
-        globals()['checkpoint_msg'] -= 1
-    if golden_tile_msg_timer > 0 and golden_tile_msg:
-        glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
-        glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
-        glColor3f(0,0,0)
-        glBegin(GL_QUADS)
-        glVertex2f(window_width//2-200, window_height//2+120)
-        glVertex2f(window_width//2+200, window_height//2+120)
-        glVertex2f(window_width//2+200, window_height//2+170)
-        glVertex2f(window_width//2-200, window_height//2+170)
-        glEnd()
-        draw_text(window_width//2 - 180, window_height//2 + 140, golden_tile_msg)
-        glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
+    if w.lava_msg_timer > 0 and w.lava_msg:
+        hud_widgets['lava'].draw((window_width - 320, window_height - 60, w.lava_msg, (1, 0.3, 0), False))
+
+    if w.checkpoint_msg > 0:
+        hud_widgets['checkpoint'].draw((window_width//2, window_height//2 + 80, "Checkpoint Saved!", (1, 1, 1), True))
+    if w.golden_tile_msg_timer > 0 and w.golden_tile_msg:
+        hud_widgets['golden'].draw((200, window_height//2+120, window_height//2+170, window_height//2+140, w.golden_tile_msg))
+
+def toggle_perf_overlay():
+    global perf_overlay
+    perf_overlay = perf_counters.enabled = not perf_overlay
+
+def bar_quads(xs, y0, y1):
+    # (4n, 3) float32 quads, one pixel wide at each x, from y0 to y1
+    v = np.zeros((len(xs), 4, 3), np.float32)
+    v[:, 0, 0] = v[:, 3, 0] = xs
+    v[:, 1, 0] = v[:, 2, 0] = xs + 1
+    v[:, 0, 1] = v[:, 1, 1] = y0
+    v[:, 2, 1] = v[:, 3, 1] = y1
+    return v.reshape(-1, 3)
+
+def draw_perf_overlay():
+    # Below the HUD stats: frame-time graph (sim green, render orange, white
+    # line at 60 FPS), FPS percentiles and the last frame's counters
+    x0, top = 10, window_height - 40
+    y0 = top - PERF_GRAPH_H
+    counters = perf_counters.items()
+    bottom = y0 - 44 - 20*len(counters)
+    glColor3f(0.05, 0.05, 0.05)
+    glBegin(GL_QUADS)
+    glVertex2f(x0-4, bottom); glVertex2f(x0+frame_times.size+4, bottom); glVertex2f(x0+frame_times.size+4, top+4); glVertex2f(x0-4, top+4)
+    glEnd()
+    sim, render, frame = frame_times.history()
+    if len(sim):
+        scale = PERF_GRAPH_H / PERF_GRAPH_MS
+        xs = x0 + np.arange(len(sim), dtype=np.float32)
+        s = y0 + np.minimum(sim * scale, PERF_GRAPH_H)
+        r = y0 + np.minimum((sim + render) * scale, PERF_GRAPH_H)
+        glColor3f(0.2, 0.8, 0.2); draw_vertex_array(bar_quads(xs, y0, s), GL_QUADS)
+        glColor3f(1.0, 0.55, 0.0); draw_vertex_array(bar_quads(xs, s, r), GL_QUADS)
+    glColor3f(1, 1, 1)
+    glBegin(GL_LINES)
+    y60 = y0 + 1000/60 * PERF_GRAPH_H / PERF_GRAPH_MS
+    glVertex2f(x0, y60); glVertex2f(x0+frame_times.size, y60)
+    glEnd()
+    p50, p95, p99 = (1000 / max(ms, 1e-3) for ms in frame_times.percentiles())
+    last = (sim[-1], render[-1]) if len(sim) else (0.0, 0.0)
+    draw_text(x0, y0 - 20, f"FPS {p50:.0f} median  {p95:.0f} p95  {p99:.0f} p99")
+    draw_text(x0, y0 - 40, f"sim {last[0]:.2f} ms  render {last[1]:.2f} ms", (0.8, 0.8, 0.8))
+    for i, (name, n) in enumerate(counters):
+        draw_text(x0, y0 - 60 - 20*i, f"{name}: {n}", (0.8, 0.8, 0.8))
+
+def draw_messages(w):
+    # Level-1 tutorial boxes
+    mid = window_height//2
+    if w.level1_msg_active and w.level1_start_msg and w.current_level == 1:
+        hud_widgets['level1_start'].draw((240, mid+60, mid+120, mid+80, w.level1_start_msg))
+    if w.level1_checkpoint_msg_active and w.level1_checkpoint_msg:
+        hud_widgets['level1_checkpoint'].draw((240, mid+10, mid+70, mid+30, w.level1_checkpoint_msg))
+    if w.level1_all_enemies_msg_active and w.level1_all_enemies_msg:
+        hud_widgets['level1_all_enemies'].draw((240, mid-60, mid, mid-40, w.level1_all_enemies_msg))
+
+def draw_hud(w):
+    # Everything 2D for the frame, under a single projection setup
+    hud_font.build()  # before any widget bakes text into a display list
+    begin_2d()
+    draw_inventory_bar(w)
+    draw_radar(w)
+    draw_hud_stats(w)
+    if perf_overlay:
+        draw_perf_overlay()
+    draw_crosshair(scoped)
+    draw_messages(w)
+    if w.paused:
+        draw_menu(w)
+    end_2d()
 
 
 # --------------------------- Drawing --------------------------
 
-def draw_floor():
-    global current_level
+def box_visible(x0, y0, z0, x1, y1, z1):
+    # Frustum test that also feeds the per-frame cull counters
+    if view_frustum is None or view_frustum.box_visible(x0, y0, z0, x1, y1, z1):
+        cull_stats['drawn'] += 1
+        return True
+    cull_stats['culled'] += 1
+    return False
+
+def entity_visible(e, pad=0.0, offset=(0, 0, 0)):
+    # AABB test at an optional render offset (interpolation); pad covers pulse
+    # scaling, opening lids and bounding boxes centred on the part mean
+    ox, oy, oz = offset
+    return box_visible(e.x_min + ox - pad, e.y_min + oy - pad, e.z_min + oz - pad,
+                       e.x_max + ox + pad, e.y_max + oy + pad, e.z_max + oz + pad)
+
+def compile_batch(aabb, emit):
+    lst = glGenLists(1)
+    glNewList(lst, GL_COMPILE)
+    emit()
+    glEndList()
+    return (aabb, lst)
+
+def entity_batch(e):
+    return ((e.x_min, e.y_min, e.z_min, e.x_max, e.y_max, e.z_max), e.draw)
+
+def quad_batches(quads, color, z):
+    # Flat floor quads (x0, y0, x1, y1) bucketed into chunks by their centre,
+    # one (aabb, emit) batch per chunk
+    buckets = {}
+    for q in quads:
+        key = (math.floor((q[0]+q[2])/2 / STATIC_CHUNK), math.floor((q[1]+q[3])/2 / STATIC_CHUNK))
+        buckets.setdefault(key, []).append(q)
+    batches = []
+    for key in sorted(buckets):
+        qs = buckets[key]
+        def emit(qs=qs):
+            glColor3f(*color)
+            glBegin(GL_QUADS)
+            for x0, y0, x1, y1 in qs:
+                glVertex3f(x0, y0, z); glVertex3f(x1, y0, z); glVertex3f(x1, y1, z); glVertex3f(x0, y1, z)
+            glEnd()
+        aabb = (min(q[0] for q in qs), min(q[1] for q in qs), z, max(q[2] for q in qs), max(q[3] for q in qs), z)
+        batches.append((aabb, emit))
+    return batches
+
+def static_layer_plan(c):
+    # The static layer of LevelContent c as (static, obstacle) lists of
+    # (aabb, emit) batches; no GL calls, so levels are planned when staged.
+    # Everything here only changes in setup_level() or when tiles are added
+    # or removed. Batches are painted in list order (there is no depth
+    # buffer): slab, checkerboard, each tile type, column, walls.
+    static = []
     # Base slab
-    floor.draw()
-    # Wood tile overlay: draw alternating quads in two wood tones
+    static.append(entity_batch(c.floor))
+    # Wood tile overlay: alternating quads in two wood tones
     # Only paint within current world bounds if available
-    wb = globals().get('world_bounds')
+    wb = c.world_bounds
     if wb:
         # Static, world-aligned grid covering the whole field so tiles don't move with the player
         tile = 200.0
@@ -1278,180 +1739,264 @@ def draw_floor():
         x1 = math.ceil(wb['max_x'] / tile) * tile
         y0 = math.floor(wb['min_y'] / tile) * tile
         y1 = math.ceil(wb['max_y'] / tile) * tile
-        ix_max = int((x1 - x0) / tile)
-        iy_max = int((y1 - y0) / tile)
-        # pass 1: draw one color on (ix+iy) even
-        glColor3f(*get_color('brown'))
-        glBegin(GL_QUADS)
-        for ix in range(ix_max):
-            for iy in range(iy_max):
-                if ((ix + iy) & 1) == 0:
-                    x = x0 + ix*tile
-                    y = y0 + iy*tile
-                    glVertex3f(x,     y,     z)
-                    glVertex3f(x+tile,y,     z)
-                    glVertex3f(x+tile,y+tile,z)
-                    glVertex3f(x,     y+tile,z) 
-        glEnd()
-        # pass 2: other color on (ix+iy) odd
-        glColor3f(*get_color('dark_brown'))
-        glBegin(GL_QUADS)
-        for ix in range(ix_max):
-            for iy in range(iy_max):
-                if ((ix + iy) & 1) == 1:
-                    x = x0 + ix*tile
-                    y = y0 + iy*tile
-                    glVertex3f(x,     y,     z)
-                    glVertex3f(x+tile,y,     z)
-                    glVertex3f(x+tile,y+tile,z)
-                    glVertex3f(x,     y+tile,z)
-        glEnd()
-
-    for ct in checkpoint_tiles:
-        glColor3f(*get_color('bright_green'))
-        glBegin(GL_QUADS)
-        glVertex3f(ct.x-100, ct.y-100, GRID_Z+0.2)
-        glVertex3f(ct.x+100, ct.y-100, GRID_Z+0.2)
-        glVertex3f(ct.x+100, ct.y+100, GRID_Z+0.2)
-        glVertex3f(ct.x-100, ct.y+100, GRID_Z+0.2)
-        glEnd()
-    for et in exit_tiles:
-        glColor3f(*get_color('black'))
-        glBegin(GL_QUADS)
-        glVertex3f(et.x-100, et.y-100, GRID_Z+0.2)
-        glVertex3f(et.x+100, et.y-100, GRID_Z+0.2)
-        glVertex3f(et.x+100, et.y+100, GRID_Z+0.2)
-        glVertex3f(et.x-100, et.y+100, GRID_Z+0.2)
-        glEnd()
-    for lt in lava_tiles:
-        glColor3f(1.0, 0.3, 0.0)
-        glBegin(GL_QUADS)
-        glVertex3f(lt.x-100, lt.y-100, GRID_Z+0.2)
-        glVertex3f(lt.x+100, lt.y-100, GRID_Z+0.2)
-        glVertex3f(lt.x+100, lt.y+100, GRID_Z+0.2)
-        glVertex3f(lt.x-100, lt.y+100, GRID_Z+0.2)
-        glEnd()
-    for gt in golden_tiles:
-        glColor3f(*get_color('gold'))
-        glBegin(GL_QUADS)
-        glVertex3f(gt.x-100, gt.y-100, GRID_Z+0.2)
-        glVertex3f(gt.x+100, gt.y-100, GRID_Z+0.2)
-        glVertex3f(gt.x+100, gt.y+100, GRID_Z+0.2)
-        glVertex3f(gt.x-100, gt.y+100, GRID_Z+0.2)
-        glEnd()
-    
-    if current_level == 1:
-        glColor3f(0.2, 0.8, 0.2)
-        glPushMatrix()
-        glTranslatef(1500, -1100, GRID_Z + 50)  # center column on tile
-        glScalef(200, 200, 200)  # width, depth, height of column
-        glutSolidCube(1)
-        glPopMatrix()
-    # draw level-3 walls if present
-    for w in walls:
-        w.draw()
-
-def draw_keys():
+        checker = ([], [])  # (ix+iy) even, odd
+        for ix in range(int((x1 - x0) / tile)):
+            for iy in range(int((y1 - y0) / tile)):
+                x = x0 + ix*tile
+                y = y0 + iy*tile
+                checker[(ix + iy) & 1].append((x, y, x+tile, y+tile))
+        static.extend(quad_batches(checker[0], get_color('brown'), z))
+        static.extend(quad_batches(checker[1], get_color('dark_brown'), z))
+
+    # tile types in the order they overlap; level-3 tiles are off the
+    # checker grid, so every checker chunk goes down before any of them
+    for tiles, color in ((c.checkpoint_tiles, get_color('bright_green')),
+                         (c.exit_tiles, get_color('black')),
+                         (c.lava_tiles, (1.0, 0.3, 0.0)),
+                         (c.golden_tiles, get_color('gold'))):
+        quads = [(t.x-100, t.y-100, t.x+100, t.y+100) for t in tiles]
+        static.extend(quad_batches(quads, color, GRID_Z+0.2))
+
+    if c.level == 1:
+        def column():
+            glColor3f(0.2, 0.8, 0.2)
+            glPushMatrix()
+            glTranslatef(1500, -1100, GRID_Z + 50)  # center column on tile
+            glScalef(200, 200, 200)  # width, depth, height of column
+            glutSolidCube(1)
+            glPopMatrix()
+        static.append(((1400, -1200, GRID_Z-50, 1600, -1000, GRID_Z+150), column))
+    # level-3 walls if present
+    for w in c.walls:
+        static.append(entity_batch(w))
+    # obstacles get their own batches: with no depth buffer they must still be
+    # painted after the dynamic entities
+    return static, [entity_batch(ob) for ob in c.obstacles]
+
+def build_static_layer(w):
+    # Compile the static layer plan into display lists, planning it first
+    # if tiles changed since the level was staged
+    if w.static_plan is None:
+        w.static_plan = static_layer_plan(w.level_content)
+    for _, lst in w.static_batches + w.obstacle_batches:
+        glDeleteLists(lst, 1)
+    w.static_batches.clear(); w.obstacle_batches.clear()
+    Shape3D.mesh_list('cube')  # slab, walls and obstacles replay the shared cube
+    w.static_batches.extend(compile_batch(aabb, emit) for aabb, emit in w.static_plan[0])
+    w.obstacle_batches.extend(compile_batch(aabb, emit) for aabb, emit in w.static_plan[1])
+    w.static_layer_dirty = False
+
+def draw_batches(batches):
+    drawn = 0
+    for aabb, lst in batches:
+        if box_visible(*aabb):
+            glCallList(lst)
+            drawn += 1
+    perf_counters.add('draw calls', drawn)
+
+def draw_floor(w):
+    # Replay the compiled static layer, recompiling it first if tiles changed
+    if w.static_layer_dirty:
+        with profiling.scope('build_static_layer'):
+            build_static_layer(w)
+    draw_batches(w.static_batches)
+
+def draw_obstacles(w):
+    draw_batches(w.obstacle_batches)
+
+def draw_keys(w):
     glColor3f(1,1,0)
-    for kx,ky in key_positions:
+    for kx,ky in w.key_positions:
+        if not box_visible(kx-5, ky-5, GRID_Z+5.5, kx+5, ky+5, GRID_Z+10.5):
+            continue
         glPushMatrix(); glTranslatef(kx,ky,GRID_Z+8); glScalef(10,10,5); glutSolidCube(1); glPopMatrix()
+        perf_counters.add('draw calls')
+
+def draw_vertex_array(verts, mode=None):
+    # One draw call for a whole (n, 3) float32 vertex batch, triangles by default
+    if mode is None:
+        mode = GL_TRIANGLES
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, verts)
+    glDrawArrays(mode, 0, len(verts))
+    glDisableClientState(GL_VERTEX_ARRAY)
+    perf_counters.add('draw calls')
+
+def draw_projectiles(pool, radius, color):
+    # Every live projectile of a pool straight from its arrays, one batch per
+    # sphere tessellation in use; LOD bands that clamp to the same mesh share
+    # a batch
+    idx = pool.live()
+    if idx.size == 0:
+        return
+    pos = pool.positions(idx, render_alpha).astype(np.float32)
+    if view_frustum is not None:
+        seen = view_frustum.spheres_visible(pos, radius)
+        n_seen = int(seen.sum())
+        cull_stats['drawn'] += n_seen; cull_stats['culled'] += idx.size - n_seen
+        if n_seen == 0:
+            return
+        pos = pos[seen]
+    if view_eye is None:
+        by_mesh = {(8, 8): np.ones(len(pos), bool)}
+    else:
+        d = np.sqrt(((pos - np.asarray(view_eye, np.float32))**2).sum(axis=1)) + 1e-6
+        px = radius / d * lod_pixels_per_unit
+        taken = np.zeros(len(pos), bool)
+        by_mesh = {}  # (slices, stacks) -> mask of the projectiles drawn with it
+        last = len(lod_bands) - 1
+        for i, (min_px, scale) in enumerate(lod_bands):
+            # the last band also takes anything below every threshold
+            mask = ~taken if i == last else (px >= min_px) & ~taken
+            taken |= mask
+            key = lod_tessellation(8, 8, scale)
+            by_mesh[key] = by_mesh[key] | mask if key in by_mesh else mask
+    glColor3f(*color)
+    for (slices, stacks), mask in by_mesh.items():
+        if not mask.any():
+            continue
+        p = pos[mask]
+        verts = Shape3D.mesh_vertices('sphere', slices, stacks)[None, :, :] * radius + p[:, None, :]
+        draw_vertex_array(verts.reshape(-1, 3))
+
+def draw_enemies(w):
+    # Batched enemy renderer: parts are bucketed by their slot in the enemy
+    # (body, head, each hand, each spike), and within a slot by mesh and
+    # color; each bucket is transformed on the CPU (pulse scale about the
+    # enemy center plus interpolation offset) and drawn in one call. There is
+    # no depth buffer, so slots are drawn in order: every body, then every
+    # head, then the hands and spikes, and no enemy's body covers its own head
+    slots = []  # per part index: ({(mesh key, color): rows}, [rotated parts])
+    for e in w.enemies:
+        ox, oy, oz = interp_offset(e)
+        if not entity_visible(e, 0.5*max(e.width, e.depth, e.height), (ox, oy, oz)):
+            continue
+        # enemies never rotate, so a part's world transform is just the
+        # pulse scale about the enemy origin plus the interpolation offset
+        s = e.scale
+        cx, cy, cz = e.x, e.y, e.z
+        for i, p in enumerate(e.entities):
+            if i == len(slots):
+                slots.append(({}, []))
+            groups, rotated = slots[i]
+            inst = p.batch_instance((cx, cy, cz))
+            if inst is None:
+                rotated.append((e, p, (ox, oy, oz)))
+                continue
+            key, (px, py, pz), (sx, sy, sz) = inst
+            groups.setdefault((key, p.color), []).append(
+                (cx + s*px + ox, cy + s*py + oy, cz + s*pz + oz, s*sx, s*sy, s*sz))
+    for groups, rotated in slots:
+        for (key, color), rows in groups.items():
+            inst = np.array(rows, np.float32)
+            verts = Shape3D.mesh_vertices(*key)[None, :, :] * inst[:, None, 3:] + inst[:, None, :3]
+            glColor3f(*color)
+            draw_vertex_array(verts.reshape(-1, 3))
+        for e, p, (ox, oy, oz) in rotated:
+            # rotated part: draw it on its own under the enemy matrix
+            glPushMatrix()
+            glTranslatef(ox, oy, oz); glMultMatrixf(e.matrix())
+            p.draw((e.x, e.y, e.z))
+            glPopMatrix()
 
 # --------------------------- Game Loop ------------------------
 
-def display():
-    glClear(GL_COLOR_BUFFER_BIT)  # no depth buffer bit per instructions
-    camera()
-
-    # world
-    draw_floor()
-    for c in chests: c.draw()
-    for e in enemies: e.draw()
-    draw_keys()
-    for b in bullets: b.draw()
-    blue_portal.draw(); red_portal.draw()
-    # player model (hide head when in first-person)
-    player.ensure_head_visibility(camera_mode==cam_third)
-    for ct in checkpoint_tiles:
-        ct.draw()
-    for et in exit_tiles:
-        et.draw()
-    for lt in lava_tiles:
-        lt.draw()
-    for ob in obstacles:
-        ob.draw()
-    player.draw()
-
-    # HUD
-    draw_inventory_bar()
-    draw_radar()
-    draw_hud_stats()
-    if scoped:
-        draw_crosshair(True)
-    else:
-        draw_crosshair(False)
-    
-    if level1_msg_active and level1_start_msg and current_level == 1:
-        glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
-        glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
-        glColor3f(0,0,0)
-        glBegin(GL_QUADS)
-        glVertex2f(window_width//2-240, window_height//2+60)
-        glVertex2f(window_width//2+240, window_height//2+60)
-        glVertex2f(window_width//2+240, window_height//2+120)
-        glVertex2f(window_width//2-240, window_height//2+120)
-        glEnd()
-        draw_text(window_width//2-200, window_height//2+80, level1_start_msg, (1,1,1))
-        glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
-        
-    
-    if level1_checkpoint_msg_active and level1_checkpoint_msg:
-        glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
-        glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
-        glColor3f(0,0,0)
-        glBegin(GL_QUADS)
-        glVertex2f(window_width//2-240, window_height//2+10)
-        glVertex2f(window_width//2+240, window_height//2+10)
-        glVertex2f(window_width//2+240, window_height//2+70)
-        glVertex2f(window_width//2-240, window_height//2+70)
-        glEnd()
-        draw_text(window_width//2-200, window_height//2+30, level1_checkpoint_msg, (1,1,1))
-        glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
-        
-    if level1_all_enemies_msg_active and level1_all_enemies_msg:
-        glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
-        glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
-        glColor3f(0,0,0)
-        glBegin(GL_QUADS)
-        glVertex2f(window_width//2-240, window_height//2-60)
-        glVertex2f(window_width//2+240, window_height//2-60)
-        glVertex2f(window_width//2+240, window_height//2)
-        glVertex2f(window_width//2-240, window_height//2)
-        glEnd()
-        draw_text(window_width//2-200, window_height//2-40, level1_all_enemies_msg, (1,1,1))
-        glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
+def interp_offset(e):
+    # Offset from the simulated position to the render position between the
+    # previous and current tick (render_alpha = 0 -> previous, 1 -> current)
+    a = 1.0 - render_alpha
+    return (e.prev_x - e.x)*a, (e.prev_y - e.y)*a, (e.prev_z - e.z)*a
 
-    # Menus
-    if paused:
-        draw_menu()
-    
-    glutSwapBuffers()
+def draw_interpolated(e):
+    ox, oy, oz = interp_offset(e)
+    if ox or oy or oz:
+        glPushMatrix(); glTranslatef(ox, oy, oz); e.draw(); glPopMatrix()
+    else:
+        e.draw()
+
+def display(w):
+    t0 = time.perf_counter()
+    with profiling.scope('display'):
+        profiling.phase('camera')
+        perf_counters.add('enemies', len(w.enemies))
+        perf_counters.add('bullets', len(w.bullets))
+        perf_counters.add('enemy shots', len(w.enemy_shots))
+        glClear(GL_COLOR_BUFFER_BIT)  # no depth buffer bit per instructions
+        cull_stats['drawn'] = cull_stats['culled'] = 0
+        camera(w)
+
+        # world
+        profiling.phase('floor')
+        draw_floor(w)
+        profiling.phase('chests')
+        for c in w.chests:
+            if entity_visible(c, 0.5*max(c.width, c.depth, c.height)): c.draw()
+        profiling.phase('enemies')
+        draw_enemies(w)
+        profiling.phase('keys')
+        draw_keys(w)
+        profiling.phase('projectiles')
+        draw_projectiles(w.bullets, 6, get_color('red'))
+        draw_projectiles(w.enemy_shots, 5, (1, 1, 0))
+        profiling.phase('portals')
+        for portal in (w.blue_portal, w.red_portal):
+            if portal.active and box_visible(portal.x-32, portal.y-32, portal.z-32, portal.x+32, portal.y+32, portal.z+32):
+                portal.draw()
+        # player model (hide head when in first-person)
+        profiling.phase('obstacles')
+        w.player.ensure_head_visibility(camera_mode==cam_third)
+        draw_obstacles(w)
+        profiling.phase('player')
+        draw_interpolated(w.player)
+
+        # HUD and menus
+        profiling.phase('hud')
+        draw_hud(w)
+
+        profiling.phase('swap')
+        glutSwapBuffers()
+    perf_counters.add('culled', cull_stats['culled'])
+    record_frame_time((time.perf_counter() - t0) * 1e3)
+    if first_frame_ms is None:
+        first_frame_done()
+    end_frame()
+
+def first_frame_done():
+    global first_frame_ms
+    first_frame_ms = (time.perf_counter() - launch_time) * 1e3
+    if report_startup:
+        print(f"First frame {first_frame_ms:.0f} ms after import")
+
+def record_frame_time(render_ms):
+    global sim_time_ms
+    frame_times.add(sim_time_ms, render_ms, frame_dt * 1e3)
+    sim_time_ms = 0.0
+
+def start_profile(frames=None):
+    # Record the next frames (default profile_frames) into PROFILE_DIR
+    if profiling.start(frames or profile_frames, PROFILE_DIR):
+        print(f"Profiling the next {frames or profile_frames} frames...")
+
+def end_frame():
+    perf_counters.end_frame()
+    saved = profiling.frame_end()
+    if saved:
+        print("Profile written to " + " and ".join(saved))
 
 # --------------------------- Menus ----------------------------
 
-def draw_menu():
+def draw_menu(w):
     # menu_mode: 'title', 'paused', 'win', 'lose', customization
-    if menu_mode == 'win':
+    if w.menu_mode == 'win':
         title = 'You Win'
-    elif menu_mode == 'lose':
+    elif w.menu_mode == 'lose':
         title = 'You Lost'
-    elif menu_mode == 'paused':
+    elif w.menu_mode == 'paused':
         title = 'Paused'
-    elif menu_mode == 'customization':
+    elif w.menu_mode == 'customization':
         title = 'Player Customization'
     else:
         title = 'Demons & Portals'
-    glMatrixMode(GL_PROJECTION); glPushMatrix(); glLoadIdentity(); gluOrtho2D(0, window_width, 0, window_height)
-    glMatrixMode(GL_MODELVIEW); glPushMatrix(); glLoadIdentity()
     # dark overlay
     glColor3f(0,0,0)
     glBegin(GL_QUADS)
@@ -1460,117 +2005,144 @@ def draw_menu():
     # Centered menu copy
     center_x = window_width//2
     center_y = window_height//2
-    draw_text(center_x-120, center_y+60, title)
-    if menu_mode=='title':
-        draw_text(center_x-160, center_y-10, 'Press N for New Game')
-    elif menu_mode=='paused':
-        draw_text(center_x-300, center_y-10, 'ESC Resume | L Load Checkpoint | R Restart Level')
-    elif menu_mode in ('win','lose'):
-        draw_text(center_x-140, center_y-10, f'Total Score: {int(score)}')
-        clear_level()
-    elif menu_mode == 'customization':
-        global player_style
-        draw_text(window_width/2-200, window_height-170, f'Press F5 to toggle player style. Current style: {player_style} ')
-    glPopMatrix(); glMatrixMode(GL_PROJECTION); glPopMatrix(); glMatrixMode(GL_MODELVIEW)
+    draw_text_centered(center_x, center_y+60, title)
+    if w.menu_mode=='title':
+        draw_text_centered(center_x, center_y-10, 'Press N for New Game')
+    elif w.menu_mode=='paused':
+        draw_text_centered(center_x, center_y-10, 'ESC Resume | L Load Checkpoint | R Restart Level')
+    elif w.menu_mode in ('win','lose'):
+        draw_text_centered(center_x, center_y-10, f'Total Score: {int(w.score)}')
+        clear_level(w)
+    elif w.menu_mode == 'customization':
+        style = w.player.styles[w.player.style]
+        draw_text_centered(center_x, window_height-170, f'Press F5 to toggle player style. Current style: {style} ')
 
 # --------------------------- Update ---------------------------
 
-def animate():
-    global score, best_score, paused, win_check_cooldown, level1_checkpoint_msg, level1_checkpoint_msg_active, level1_enemy_stat, level1_enemies_spawned, level1_all_enemies_msg, level1_all_enemies_msg_active, lava_msg, lava_msg_timer, golden_tile_msg, golden_tile_msg_timer, trap_triggered, once, current_level, level3_trap_boss_spawned
-    if not paused:
+def enemy_defeated(w, e):
+    # Score (and possibly win) for an enemy killed by a bullet
+    if e.is_boss and w.current_level == 3:
+        score_add(w, 500)
+        pause_game(w, 'win')
+    elif e.is_boss and w.current_level == 1:
+        score_add(w, 200)
+    else:
+        score_add(w, 20)
+
+def resolve_bullet_hits(w):
+    # Batched bullet-vs-enemy test: all bullet/enemy distances at once in
+    # NumPy, then a Python pass over only the bullets that hit something.
+    # Bullets resolve in firing order against the first live enemy in list
+    # order, so a defeated enemy can't absorb a later bullet this tick.
+    if not len(w.bullets) or not w.enemies:
+        return
+    live = w.bullets.live()
+    ne = len(w.enemies)
+    bx = w.bullets.x[live]
+    by = w.bullets.y[live]
+    ex = np.fromiter((e.x for e in w.enemies), float, ne)
+    ey = np.fromiter((e.y for e in w.enemies), float, ne)
+    er = np.fromiter((e.hit_radius for e in w.enemies), float, ne)
+    dx = bx[:, None] - ex[None, :]
+    dy = by[:, None] - ey[None, :]
+    hits = dx*dx + dy*dy < er*er
+    perf_counters.add('collision pairs', hits.size)
+    rows = np.flatnonzero(hits.any(axis=1))
+    if rows.size == 0:
+        return
+    alive = np.ones(ne, bool)
+    spent = []; gone = []
+    for i in rows:
+        js = np.flatnonzero(hits[i] & alive)
+        if js.size == 0:
+            continue
+        j = js[0]
+        e = w.enemies[j]
+        spent.append(live[i])  # remove bullet on any hit
+        if e.hit_by_bullet(float(w.bullets.dmg[live[i]])) == 'defeated':
+            alive[j] = False
+            gone.append(e)
+            enemy_defeated(w, e)
+    w.bullets.kill(spent)
+    if gone:
+        w.remove_enemies(gone)
+
+def animate(w):
+    player = w.player
+    if not w.paused:
         # movement animation and physics
+        profiling.phase('player')
         player.physics()
-        if current_level == 2:
-            for e in enemies:
-                if obstacles[0].check_collision(e):
-                    enemies.remove(e)
+        profiling.phase('hazards')
+        perf_counters.add('tiles tested', len(w.lava_tiles))
+        if w.current_level == 2:
+            for e in list(w.enemies):
+                if w.obstacles[0].check_collision(e):
+                    w.remove_enemy(e)
         on_lava = False
-        for lt in lava_tiles:
+        for lt in w.lava_tiles:
             if lt.active and math.hypot(player.x - lt.x, player.y - lt.y) < 100:
                 player.health -= 0.05  # damage per frame on lava
                 on_lava = True
                 break
         if on_lava:
-            lava_msg = "Ouch!!! Lava hurts!!!"
-            lava_msg_timer = 60  # show for 60 frames (~1 second)
-        elif lava_msg_timer > 0:
-            lava_msg_timer -= 1
-            if lava_msg_timer == 0:
-                lava_msg = ""
-        if golden_tile_msg_timer > 0:
-            golden_tile_msg_timer -= 1
-            if golden_tile_msg_timer == 0:
-                golden_tile_msg = ""
-        # bullets
-        alive = []
-        for b in bullets:
-            if b.update(): alive.append(b)
-        bullets[:] = alive
+            w.lava_msg = "Ouch!!! Lava hurts!!!"
+            w.lava_msg_timer = 60  # show for 60 frames (~1 second)
+        elif w.lava_msg_timer > 0:
+            w.lava_msg_timer -= 1
+            if w.lava_msg_timer == 0:
+                w.lava_msg = ""
+        if w.golden_tile_msg_timer > 0:
+            w.golden_tile_msg_timer -= 1
+            if w.golden_tile_msg_timer == 0:
+                w.golden_tile_msg = ""
+        if w.checkpoint_msg > 0:
+            w.checkpoint_msg -= 1
+        # bullets: vectorized move and range expiry
+        profiling.phase('bullets')
+        w.bullets.update()
         # enemies
-        for e in enemies:
-            e.update(player)
+        profiling.phase('enemies')
+        perf_counters.add('collision pairs', len(w.enemies))  # each enemy against the player
+        for e in w.enemies:
+            e.update(player, w.enemy_shots)
             # enemy collision / damage
             if e.check_collision(player):
                 if e.is_boss:
-                    if current_level == 3:
-                        score_add(500)
-                        pause_game('win')
-                    elif current_level == 1:
-                        score_add(200)
+                    if w.current_level == 3:
+                        score_add(w, 500)
+                        pause_game(w, 'win')
+                    elif w.current_level == 1:
+                        score_add(w, 200)
                 else:
                     player.health -= 10
-                    enemies.remove(e)
+                    w.remove_enemy(e)
                 break
-            # boss projectile hits
-            if e.is_boss:
-                for pb in list(e.projectiles):
-                    # approximate hit on player center
-                    if math.hypot(pb['x']-player.x, pb['y']-player.y) < 20:
-                        player.health -= 10
-                        e.projectiles.remove(pb)
+        # enemy shots: vectorized move, lifetime and arena culling, then
+        # approximate hits on the player center
+        profiling.phase('enemy_shots')
+        w.enemy_shots.update(w.world_bounds)
+        player.health -= 10 * w.enemy_shots.hit_test(player.x, player.y, 20)
+        perf_counters.add('collision pairs', len(w.enemy_shots))
         # bullet hit enemies (improved collision + boss lives logic)
-        for b in list(bullets):
-            for e in list(enemies):
-                dx = b.x - e.x; dy = b.y - e.y
-                hit_r = getattr(e, 'hit_radius', 20)
-                if math.hypot(dx, dy) < hit_r:
-                    if hasattr(e, 'hit_by_bullet'):
-                        outcome = e.hit_by_bullet(b.dmg)
-                        if outcome == 'defeated':
-                            enemies.remove(e)
-                            if e.is_boss and current_level == 3:
-                                score_add(500)
-                                pause_game('win')
-                            elif e.is_boss and current_level == 1:
-                                score_add(200)
-                            else:
-                                score_add(20)
-                        # remove bullet on any hit
-                        try: bullets.remove(b)
-                        except: pass
-                        break
-                    else:
-                        e.hp -= b.dmg
-                        if e.hp <= 0:
-                            enemies.remove(e)
-                            score_add(20 if not e.is_boss else 200)
-                        try: bullets.remove(b)
-                        except: pass
-                        break
-        for gt in golden_tiles:
+        profiling.phase('bullet_hits')
+        resolve_bullet_hits(w)
+        profiling.phase('tiles')
+        perf_counters.add('tiles tested', len(w.golden_tiles) + len(w.checkpoint_tiles) + len(w.exit_tiles))
+        for gt in w.golden_tiles:
             if gt.active and not gt.triggered and math.hypot(player.x - gt.x, player.y - gt.y) < 100:
-                golden_tile_msg = gt.message
-                golden_tile_msg_timer = 120  # show for 2 seconds
+                w.golden_tile_msg = gt.message
+                w.golden_tile_msg_timer = 120  # show for 2 seconds
                 gt.triggered = True
                 # Trap logic: spawn enemies if this is the trap tile
-                if gt.message == "Uh oh!!! A trap. Use the Rifle for longer range." and not trap_triggered:
-                    for pos in trap_spawn_locations:
-                        enemies.append(Enemy(pos[0], pos[1], GRID_Z, False))
-
-                if gt.message == "Muahaha!!! Even bigger trap!" and not trap_triggered:
-                    trap_triggered = True
-                    positions = [(1100, 900), (1100, 100), (1100, -700)]
-                    for pos in positions:
+                spawn = w.level_triggers.get(gt.trigger, {}).get('spawn', [])
+                if gt.trigger == 'rifle_trap' and not w.trap_triggered:
+                    for pos in spawn:
+                        w.add_enemy(Enemy(pos[0], pos[1], GRID_Z, False, rng=w.rng))
+
+                if gt.trigger == 'turret_trap' and not w.trap_triggered:
+                    w.trap_triggered = True
+                    for pos in spawn:
                         turret = Enemy(pos[0], pos[1], GRID_Z, True, 1)
                         turret.hp = 20         # Weaker health
                         turret.speed = 0       # Stationary turret
@@ -1581,44 +2153,45 @@ def animate():
                                 e.height *= 0.6
                             if hasattr(e, 'radius'):
                                 e.radius *= 0.6
-                        enemies.append(turret)
+                        turret.invalidate()
+                        w.add_enemy(turret)
 
-                if gt.message == "Oh no they're fast" and not trap_triggered:
-                    trap_triggered = True
-                    positions = [(100, -200), (100, -300), (100, -500), (100, -700), (100, -300),(100, -500), (100, -700),(100, -500), (100, -700), (100, -500), (100, -700), (100, -300), (100, -500), (100, -700)]
-                    for x, y in positions:
+                if gt.trigger == 'fast_trap' and not w.trap_triggered:
+                    w.trap_triggered = True
+                    for x, y in spawn:
                         
-                        enemies.append(FastEnemy(x, y, GRID_Z))
+                        w.add_enemy(FastEnemy(x, y, GRID_Z, w.rng))
                     
-                    place_exit_tile(100, -700)
+                    place_exit_tile(w, 100, -700)
 
                 # Level 3 golden row trap: spawn another boss and remove the golden row
-                if gt.message == TRAP_MSG and not level3_trap_boss_spawned and current_level == 3:
+                if gt.trigger == 'boss_row_trap' and not w.level3_trap_boss_spawned and w.current_level == 3:
                     # spawn a new boss at a different corner
-                    wb = globals().get('world_bounds')
+                    wb = w.world_bounds
                     if wb:
                         bx = wb['min_x'] + 150
                         by = wb['max_y'] - 150
                     else:
                         bx = -400; by = 400
-                    enemies.append(Enemy(bx, by, GRID_Z, True))
-                    level3_trap_boss_spawned = True
-                    # remove all golden tiles in this row (identified by message)
-                    golden_tiles[:] = [t for t in golden_tiles if getattr(t, 'message', None) != TRAP_MSG]
+                    w.add_enemy(Enemy(bx, by, GRID_Z, True))
+                    w.level3_trap_boss_spawned = True
+                    # remove all golden tiles in this row (identified by trigger)
+                    w.golden_tiles[:] = [t for t in w.golden_tiles if t.trigger != 'boss_row_trap']
+                    invalidate_static_layer(w)
 
-        for ct in checkpoint_tiles:
+        for ct in w.checkpoint_tiles:
             if ct.active and math.hypot(player.x - ct.x, player.y - ct.y) < 100:
-                set_checkpoint((ct.x, ct.y))
+                set_checkpoint(w, (ct.x, ct.y))
                 ct.saved = True
-                # Show message (simple: set a global for a few frames)
-                globals()['checkpoint_msg'] = 120  # show for 120 frames
+                # Show message (simple: set a world field for a few frames)
+                w.checkpoint_msg = 120  # show for 120 ticks
 
-                if current_level == 1:
-                    level1_checkpoint_msg = "Excellent!!! Now kill the enemies!!!"
-                    level1_checkpoint_msg_active = True
+                if w.current_level == 1:
+                    w.level1_checkpoint_msg = "Excellent!!! Now kill the enemies!!!"
+                    w.level1_checkpoint_msg_active = True
                     
-                    if level1_enemy_stat == 0:
-                        wb = globals().get('world_bounds')
+                    if w.level1_enemy_stat == 0:
+                        wb = w.world_bounds
                         pad = 120  # keep enemies away from the wall
                         for i in range(5):
                             angle = i * (2 * math.pi / 5)
@@ -1627,150 +2200,157 @@ def animate():
                             # Clamp positions to stay inside the playable area
                             ex = clamp(ex, wb['min_x'] + pad, wb['max_x'] - pad)
                             ey = clamp(ey, wb['min_y'] + pad, wb['max_y'] - pad)
-                            enemies.append(Enemy(ex, ey, GRID_Z, False))
-                        level1_enemy_stat = 1
-                        level1_enemies_spawned = True
+                            w.add_enemy(Enemy(ex, ey, GRID_Z, False, rng=w.rng))
+                        w.level1_enemy_stat = 1
+                        w.level1_enemies_spawned = True
         
-        for et in exit_tiles:
+        if w.preload_job is None or w.preload_job.level != w.current_level + 1:
+            if any(et.active and math.hypot(player.x - et.x, player.y - et.y) < PRELOAD_EXIT_RADIUS for et in w.exit_tiles):
+                preload_level(w, w.current_level + 1)
+        for et in w.exit_tiles:
             if et.active and math.hypot(player.x - et.x, player.y - et.y) < 60:
                 # Advance to next level
-                setup_level(current_level + 1)
-                exit_tiles.clear()  # Remove exit tiles for next level
+                setup_level(w, w.current_level + 1)
+                w.exit_tiles.clear()  # Remove exit tiles for next level
                 break
                 
         # pickups physics
-        for p in pickups:
+        profiling.phase('pickups')
+        for p in w.pickups:
             p['vz'] -= 0.3
             p['z'] += p['vz']
             if p['z'] <= GRID_Z+8:
                 p['z'] = GRID_Z+8; p['vz']=0
         # pickup collection
-        for p in list(pickups):
-            if math.hypot(p['x']-player.x, p['y']-player.y) < 30:
-                apply_pickup(p['name'])
-                pickups.remove(p)
-                score_add(5)
+        for p in w.pickup_grid.query_radius(player.x, player.y, 30):
+            apply_pickup(w, p['name'])
+            w.pickups.remove(p); w.pickup_grid.remove(p)
+            score_add(w, 5)
         # keys collection
-        for k in list(key_positions):
-            if math.hypot(k[0]-player.x, k[1]-player.y) < 30:
-                player.inventory['keys'] += 1
-                key_positions.remove(k)
-                score_add(3)
+        for k in w.key_grid.query_radius(player.x, player.y, 30):
+            player.inventory['keys'] += 1
+            w.key_positions.remove(k); w.key_grid.remove(k)
+            score_add(w, 3)
         # portals teleport
-        if blue_portal.active and red_portal.active:
-            for e in [player] + enemies:
-                if math.hypot(e.x-blue_portal.x, e.y-blue_portal.y) < 25:
-                    e.move(red_portal.x - e.x, red_portal.y - e.y)
+        profiling.phase('rules')
+        if w.blue_portal.active and w.red_portal.active:
+            near = w.enemy_grid.query_radius(w.blue_portal.x, w.blue_portal.y, 25)
+            if math.hypot(player.x-w.blue_portal.x, player.y-w.blue_portal.y) < 25:
+                near.insert(0, player)
+            for e in near:
+                e.move(w.red_portal.x - e.x, w.red_portal.y - e.y)
+                e.save_prev()
         # checkpoints trigger
-        for cx,cy in checkpoints:
+        for cx,cy in w.checkpoints:
             if math.hypot(player.x-cx, player.y-cy) < 20:
-                set_checkpoint((cx,cy))
+                set_checkpoint(w, (cx,cy))
         # health check / win conditions
         if player.health<=0:
-            pause_game('lose')
+            pause_game(w, 'lose')
             return
         # Secondary win guard: if no bosses remain and we had one, declare win
-        if current_level==3 and win_check_cooldown==0:
-            if any(e.is_boss for e in enemies):
-                globals()['boss_seen_alive'] = True
-            if boss_spawned and boss_seen_alive and not any(e.is_boss for e in enemies):
-                pause_game('win')
-                score_add(500)
-        if win_check_cooldown>0:
-            win_check_cooldown -= 1
+        if w.current_level==3 and w.win_check_cooldown==0:
+            if any(e.is_boss for e in w.enemies):
+                w.boss_seen_alive = True
+            if w.boss_spawned and w.boss_seen_alive and not any(e.is_boss for e in w.enemies):
+                pause_game(w, 'win')
+                score_add(w, 500)
+        if w.win_check_cooldown>0:
+            w.win_check_cooldown -= 1
         # score as time-based (speedrun style)
-        if start_time:
-            elapsed = time.time()-start_time
+        if w.start_time:
+            elapsed = time.time()-w.start_time
             # higher score for faster clear -> we subtract elapsed each tick
             pass
-        if current_level == 1 and level1_enemies_spawned:
+        if w.current_level == 1 and w.level1_enemies_spawned:
             # Only show message if all spawned enemies are dead and message not yet shown
-            if level1_all_enemies_msg_active is False and level1_enemies_spawned and all(not e.is_boss for e in enemies) and len(enemies) == 0 and once == 0:
-                level1_all_enemies_msg = "Great job!!! Move to the next golden tile!"
-                level1_all_enemies_msg_active = True
-                once = 1
-    glutPostRedisplay()
+            if w.level1_all_enemies_msg_active is False and w.level1_enemies_spawned and all(not e.is_boss for e in w.enemies) and len(w.enemies) == 0 and w.once == 0:
+                w.level1_all_enemies_msg = "Great job!!! Move to the next golden tile!"
+                w.level1_all_enemies_msg_active = True
+                w.once = 1
 
 # --------------------------- Score ----------------------------
 
-def score_add(v):
-    global score, best_score
-    score += v
-    best_score = max(best_score, score)
+def score_add(w, v):
+    w.score += v
+    w.best_score = max(w.best_score, w.score)
 
 #Listeners
 
-moving = {'w':False,'a':False,'s':False,'d':False}
+# The session the window plays; the GLUT callbacks below act on it
+world = World()
 
 
 def keys(key, x, y):
-    global paused, menu_mode, camera_mode, scoped, fovY, selected_slot, pre_topdown_camera_mode, player
+    global camera_mode, scoped, fovY, pre_topdown_camera_mode
+    w = world
     k = key
     if k==b'\x1b':  # ESC
-        if paused:
-            paused=False; menu_mode=None
+        if w.paused:
+            w.paused=False; w.menu_mode=None
         else:
-            pause_game('paused')
+            pause_game(w, 'paused')
         return
     if k==b'o':
-        if paused:
-            paused=False; menu_mode=None
+        if w.paused:
+            w.paused=False; w.menu_mode=None
         else:
-            pause_game('paused')
-            menu_mode='customization'
+            pause_game(w, 'paused')
+            w.menu_mode='customization'
         return
-    if paused:
-        if k in (b'n', b'N') and menu_mode=='title':
-            paused=False; menu_mode=None
-            setup_level(1)
+    if w.paused:
+        if k in (b'n', b'N') and w.menu_mode=='title':
+            w.paused=False; w.menu_mode=None
+            setup_level(w, 1)
             return
-        if k in (b'r', b'R') and menu_mode=='paused':
-            setup_level(current_level)
-            paused=False; menu_mode=None
+        if k in (b'r', b'R') and w.menu_mode=='paused':
+            setup_level(w, w.current_level)
+            w.paused=False; w.menu_mode=None
             return
-        if k in (b'l', b'L') and menu_mode=='paused':
-            load_checkpoint(); paused=False; menu_mode=None
+        if k in (b'l', b'L') and w.menu_mode=='paused':
+            load_checkpoint(w); w.paused=False; w.menu_mode=None
             return
         return
 
     # gameplay keys
     if k in (b'w',b'a',b's',b'd'):
-        moving[k.decode()] = True
+        w.moving[k.decode()] = True
     if k==b' ':
-        player.jump()
+        w.player.jump()
     if k in (b'p', b'P'):
-        toggle_perspective()
+        toggle_perspective(w)
     if k==b'k':
         # test: toggle nearest chest
-        if chests:
-            nearest = min(chests, key=lambda c: math.hypot(c.x-player.x,c.y-player.y))
-            if math.hypot(nearest.x-player.x, nearest.y-player.y) < 80:
-                if nearest.contains:
-                    open_chest(nearest)
-                else:
-                    nearest.toggle()
+        nearest = w.chest_grid.nearest(w.player.x, w.player.y, 80)
+        if nearest is not None:
+            if nearest.contains:
+                open_chest(w, nearest)
+            else:
+                nearest.toggle()
     # inventory hotkeys 1..9
     if k in [bytes(str(i),'ascii') for i in range(1,10)]:
-        selected_slot = int(k.decode())
+        w.player.active_slot = int(k.decode())
     if k in (b't', b'T'):
         if camera_mode != cam_topdown:
             pre_topdown_camera_mode = camera_mode
-            set_camera_mode(cam_topdown)
+            set_camera_mode(w, cam_topdown)
         else:
-            set_camera_mode(pre_topdown_camera_mode)
+            set_camera_mode(w, pre_topdown_camera_mode)
             
     if k in (b'c', b'C'):
-        load_checkpoint()
+        load_checkpoint(w)
 
 
 def key_up(key, x, y):
+    w = world
     if key in (b'w',b'a',b's',b'd'):
-        moving[key.decode()] = False
+        w.moving[key.decode()] = False
 
 
 def special_keys(key, x, y):
     # arrow keys adjust third-person camera in the X/Y plane (Z locked)
-    global third_cam_back, third_cam_side, player, menu_mode
+    global third_cam_back, third_cam_side
+    w = world
     if camera_mode == cam_third:
         if key == GLUT_KEY_LEFT:
             third_cam_side -= 5
@@ -1783,41 +2363,46 @@ def special_keys(key, x, y):
     # test level shortcuts removed
 
     # style change
-    if menu_mode == 'customization' and key == GLUT_KEY_F5: player.change_style()
+    if w.menu_mode == 'customization' and key == GLUT_KEY_F5: w.player.change_style()
+    if key == GLUT_KEY_F3:
+        toggle_perf_overlay()
+    if key == GLUT_KEY_F9:
+        start_profile()
 
 def clicks(button, state, x, y):
-    global scoped, pre_scope_camera_mode, fovY, yaw_step, yaw_step_values
+    global scoped, pre_scope_camera_mode, fovY
+    w = world
     if state != GLUT_DOWN and button != GLUT_RIGHT_BUTTON: return
     # map window x,y not used — just actions
     if button == GLUT_LEFT_BUTTON:
         # left click: shoot / place portal / use consumable depending on slot
-        do_primary_action()
+        do_primary_action(w)
     if button == GLUT_RIGHT_BUTTON:
         # right click: scope
         if state == GLUT_DOWN:
             scoped = True
             pre_scope_camera_mode = camera_mode
-            set_camera_mode(cam_first)
+            set_camera_mode(w, cam_first)
             set_fov(True)
-            yaw_step = yaw_step_values[1]
+            w.yaw_step = yaw_step_values[1]
         else:
             scoped = False
             set_fov(False)
-            set_camera_mode(pre_scope_camera_mode)
-            yaw_step = yaw_step_values[0]
+            set_camera_mode(w, pre_scope_camera_mode)
+            w.yaw_step = yaw_step_values[0]
 
     # wheel
     if button == 3:  # wheel up
-        change_slot(-1)
+        change_slot(w, -1)
     if button == 4:  # wheel down
-        change_slot(1)
+        change_slot(w, 1)
 
 def set_fov(scope):
     global fovY
     fovY = fovY_scoped if scope else fovY_default
 
 
-def set_camera_mode(mode):
+def set_camera_mode(w, mode):
     global camera_mode, cam_eye, cam_cen
     camera_mode = mode
     # reset smoothing accumulators when switching modes to avoid laggy snaps
@@ -1825,123 +2410,117 @@ def set_camera_mode(mode):
     cam_cen = None
     # hide head in first person to avoid blocking view; show in third
     if mode == cam_first:
-        player.ensure_head_visibility(False)
+        w.player.ensure_head_visibility(False)
     else:
-        player.ensure_head_visibility(True)
+        w.player.ensure_head_visibility(True)
 
 
-def toggle_perspective():
+def toggle_perspective(w):
     if scoped:
         return  # scoped locks to first person
-    set_camera_mode(cam_first if camera_mode==cam_third else cam_third)
+    set_camera_mode(w, cam_first if camera_mode==cam_third else cam_third)
 
 
-def change_slot(delta):
-    global selected_slot
-    selected_slot = ((selected_slot-1 + delta) % 9) + 1
+def change_slot(w, delta):
+    w.player.active_slot = ((w.player.active_slot-1 + delta) % 9) + 1
 
 
-def do_primary_action():
-    item = inventory_slots.get(selected_slot, '')
+def do_primary_action(w):
+    item = inventory_slots.get(w.player.active_slot, '')
     if item=='handgun':
-        shoot_handgun()
+        shoot_handgun(w)
     elif item=='rifle':
-        shoot_rifle()
-    elif item=='portalgun' and player.inventory['portalgun']:
-        place_portal()
-    elif item=='Nourishment' and player.inventory['Nourishment']>0:
-        player.inventory['Nourishment']-=1; apply_pickup('Nourishment')
-    elif item=='Aegis' and player.inventory['Aegis']>0:
-        player.inventory['Aegis']-=1; 
+        shoot_rifle(w)
+    elif item=='portalgun' and w.player.inventory['portalgun']:
+        place_portal(w)
+    elif item=='Nourishment' and w.player.inventory['Nourishment']>0:
+        w.player.inventory['Nourishment']-=1; apply_pickup(w, 'Nourishment')
+    elif item=='Aegis' and w.player.inventory['Aegis']>0:
+        w.player.inventory['Aegis']-=1; 
     elif item=='Shard':
         pass
 
 
-def shoot_handgun():
-    if player.inventory['handgun_ammo']<=0: return
-    player.inventory['handgun_ammo']-=1
+def shoot_handgun(w):
+    if w.player.inventory['handgun_ammo']<=0: return
+    w.player.inventory['handgun_ammo']-=1
     # bullet spawns at player head / gun tip forward
-    head = player.head_entity()
-    ang = math.radians(player.yaw)
+    hx, hy, hz = w.player.part_position(w.player.head_entity())
+    ang = math.radians(w.player.yaw)
     vx = math.cos(ang)*16
     vy = math.sin(ang)*16
-    dmg = player.damage
-    bullets.append(Bullet((head.x + math.cos(ang) * 55), (head.y + math.sin(ang) * 55), head.z - 15, vx, vy, dmg))
+    dmg = w.player.damage
+    w.bullets.spawn((hx + math.cos(ang) * 55), (hy + math.sin(ang) * 55), hz - 15, vx, vy, dmg)
 
-def shoot_rifle():
-    if player.inventory['rifle_ammo'] <= 0:
+def shoot_rifle(w):
+    if w.player.inventory['rifle_ammo'] <= 0:
         return
-    player.inventory['rifle_ammo'] -= 1
-    head = player.head_entity()
-    ang = math.radians(player.yaw)
+    w.player.inventory['rifle_ammo'] -= 1
+    hx, hy, hz = w.player.part_position(w.player.head_entity())
+    ang = math.radians(w.player.yaw)
     vx = math.cos(ang) * 28 
     vy = math.sin(ang) * 28
-    dmg = player.damage + 15 
+    dmg = w.player.damage + 15 
     max_dist = 1600
-    bullets.append(Bullet(head.x + math.cos(ang) * 55, head.y + math.sin(ang) * 55, head.z - 15, vx, vy, dmg, max_dist))
+    w.bullets.spawn(hx + math.cos(ang) * 55, hy + math.sin(ang) * 55, hz - 15, vx, vy, dmg, max_dist)
 
-portal_toggle = True 
-
-def place_portal():
-    global portal_toggle
+def place_portal(w):
     # place portal some distance in facing direction
-    ang = math.radians(player.yaw)
-    px = player.x + math.cos(ang)*120
-    py = player.y + math.sin(ang)*120
+    ang = math.radians(w.player.yaw)
+    px = w.player.x + math.cos(ang)*120
+    py = w.player.y + math.sin(ang)*120
     pz = GRID_Z+20
-    if portal_toggle:
-        blue_portal.place(px,py,pz)
+    if w.portal_toggle:
+        w.blue_portal.place(px,py,pz)
     else:
-        red_portal.place(px,py,pz)
-    portal_toggle = not portal_toggle
+        w.red_portal.place(px,py,pz)
+    w.portal_toggle = not w.portal_toggle
 
-def open_chest(c:Chest):
+def open_chest(w, c:Chest):
     if c.closed:
-        if player.inventory['keys']>0:
-            player.inventory['keys']-=1
+        if w.player.inventory['keys']>0:
+            w.player.inventory['keys']-=1
             c.open()
             # toss item out
             if c.contains:
-                pickups.append({'name':c.contains, 'x':c.x+random.randint(-10,10), 'y':c.y+random.randint(-10,10), 'z':GRID_Z+15, 'vz':5.0})
+                w.add_pickup({'name':c.contains, 'x':c.x+w.rng.randint(-10,10), 'y':c.y+w.rng.randint(-10,10), 'z':GRID_Z+15, 'vz':5.0})
                 c.contains=None
 
 #Movement
 
-def update_movement():
-    global level1_msg_active, level1_checkpoint_msg_active, level1_all_enemies_msg_active, yaw_step
-    
-    
+def update_movement(w):
+    player = w.player
     # WASD planar move
     dx=0; dy=0
     sp = player.speed
     # yaw update from A/D keys (rotate while held)
     
     # Swap A/D rotation directions
-    if moving['a']:
-        player.yaw = (player.yaw + yaw_step) % 360
-        player.rotate_z(yaw_step)
-    if moving['d']:
-        player.yaw = (player.yaw - yaw_step) % 360
-        player.rotate_z(-yaw_step)
+    if w.moving['a']:
+        player.yaw = (player.yaw + w.yaw_step) % 360
+        player.rotate_z(w.yaw_step)
+    if w.moving['d']:
+        player.yaw = (player.yaw - w.yaw_step) % 360
+        player.rotate_z(-w.yaw_step)
     # convert WASD relative to yaw
     dir_forward = math.radians(player.yaw)
     fx, fy = math.cos(dir_forward), math.sin(dir_forward)
-    if moving['w']: dx += fx*sp; dy += fy*sp
-    if moving['s']: dx -= fx*sp; dy -= fy*sp
+    if w.moving['w']: dx += fx*sp; dy += fy*sp
+    if w.moving['s']: dx -= fx*sp; dy -= fy*sp
     if dx or dy:
-        if current_level == 1 and level1_msg_active:
-            level1_msg_active = False
+        if w.current_level == 1 and w.level1_msg_active:
+            w.level1_msg_active = False
             
-        if current_level == 1 and level1_checkpoint_msg_active:
-            level1_checkpoint_msg_active = False
+        if w.current_level == 1 and w.level1_checkpoint_msg_active:
+            w.level1_checkpoint_msg_active = False
             
-        if current_level == 1 and level1_all_enemies_msg_active:
-            level1_all_enemies_msg_active = False
+        if w.current_level == 1 and w.level1_all_enemies_msg_active:
+            w.level1_all_enemies_msg_active = False
 
         new_x = player.x + dx
         new_y = player.y + dy
         player.walk_anim_tick()
-        wb = globals().get('world_bounds')
+        wb = w.world_bounds
         if wb is not None:
             # keep a small inner padding to avoid intersecting wall geometry
             pad = 10
@@ -1951,24 +2530,118 @@ def update_movement():
             dy = new_y - player.y
         if dx or dy:
             player.move(dx,dy)
-            for ob in obstacles:
+            for ob in w.obstacles:
                 if player.check_collision(ob):
                     player.move(-dx,-dy)
 
 #On Idle
 
+def save_prev_positions(w):
+    w.player.save_prev()
+    for e in w.enemies: e.save_prev()
+    w.bullets.save_prev()
+    w.enemy_shots.save_prev()
+
+# One simulation tick: input-driven movement then game logic. No GL calls.
+def tick(w):
+    with profiling.scope('tick'):
+        save_prev_positions(w)
+        if not w.paused:
+            with profiling.scope('update_movement'):
+                update_movement(w)
+        with profiling.scope('animate'):
+            animate(w)
+        if w.hash_ticks:
+            w.tick_hashes.append(state_hash(w))
+
+def state_hash(w):
+    # CRC32 of the simulation state (level, score, player, enemies, chests,
+    # keys, pickups and live projectiles); equal across runs and processes
+    # for equal states. Message text and timers are left out
+    values = [w.current_level, w.score, w.player.x, w.player.y, w.player.z, w.player.yaw, w.player.jump_v,
+              w.player.health, w.player.damage, *w.player.inventory.values(),
+              len(w.key_positions), *(v for k in w.key_positions for v in k)]
+    for e in w.enemies:
+        values += (e.x, e.y, e.z, e.hp)
+    for c in w.chests:
+        values += (c.x, c.y, c.closed)
+    for p in w.pickups:
+        values += (p['x'], p['y'], p['z'])
+    h = zlib.crc32(np.array(values, np.float64).tobytes())
+    for pool in (w.bullets, w.enemy_shots):
+        idx = pool.live()
+        h = zlib.crc32(np.stack((pool.x[idx], pool.y[idx], pool.z[idx])).tobytes(), h)
+    return h
+
 def idle():
-    if not paused:
-        update_movement()
-    animate()
+    # Fixed-timestep accumulator: run as many SIM_DT ticks as real time has
+    # passed (capped), then render with the leftover fraction as render_alpha
+    global sim_accum, last_frame_time, frame_dt, render_alpha, sim_time_ms
+    now = time.perf_counter()
+    if last_frame_time is None:
+        last_frame_time = now
+    frame_dt = now - last_frame_time
+    last_frame_time = now
+    sim_accum += frame_dt
+    ticks = 0
+    while sim_accum >= SIM_DT and ticks < MAX_TICKS_PER_FRAME:
+        tick(world)
+        sim_accum -= SIM_DT
+        ticks += 1
+    sim_time_ms += (time.perf_counter() - now) * 1e3
+    perf_counters.add('ticks', ticks)
+    if sim_accum >= SIM_DT:
+        sim_accum = 0.0
+    render_alpha = sim_accum / SIM_DT
+    glutPostRedisplay()
 
-def pause_game(mode='paused'):
-    global paused, menu_mode
-    paused=True; menu_mode=mode
+#Headless
+
+def apply_inputs(w, inputs):
+    # inputs: held movement keys plus one-shot actions for this tick,
+    # e.g. {'w': True, 'a': True, 'jump': True, 'fire': True, 'slot': 2}
+    for k in w.moving:
+        w.moving[k] = bool(inputs.get(k, False))
+    if 'slot' in inputs:
+        w.player.active_slot = inputs['slot']
+    if inputs.get('jump'):
+        w.player.jump()
+    if inputs.get('fire'):
+        do_primary_action(w)
+
+def step(w, n_ticks=1, inputs=None):
+    # Advance the simulation n_ticks without GLUT, a window or a GL context.
+    # inputs is a dict applied on every tick, or a callable tick_index -> dict.
+    # Menus are a UI concern, so only a win/lose stops the run early.
+    # Returns the number of ticks actually simulated.
+    if w.menu_mode not in ('win', 'lose'):
+        w.paused = False; w.menu_mode = None
+    ran = 0
+    for i in range(n_ticks):
+        if w.paused:
+            break
+        held = inputs(i) if callable(inputs) else inputs
+        if held is not None:
+            apply_inputs(w, held)
+        tick(w)
+        end_frame()  # headless, every tick counts as a frame for profiling
+        ran += 1
+    return ran
+
+def pause_game(w, mode='paused'):
+    w.paused=True; w.menu_mode=mode
+
+
+def bind_gl():
+    # Star-import PyOpenGL into this module and font.py. Done here rather
+    # than at import, so the simulation (setup_level, step) loads quickly
+    # and runs without PyOpenGL; anything that draws needs it called first
+    glbind.bind(globals(), vars(font))
 
 
 def main(level=None):
     global aspect_ratio
+    bind_gl()
     glutInit()
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB)  # NO DEPTH
     glutInitWindowSize(window_width, window_height)
@@ -1976,7 +2649,7 @@ def main(level=None):
     glutCreateWindow(b"Demons & Portals")
 
     # listeners
-    glutDisplayFunc(display)
+    glutDisplayFunc(lambda: display(world))
     glutKeyboardFunc(keys)
     glutKeyboardUpFunc(key_up)
     glutSpecialFunc(special_keys)
@@ -1990,18 +2663,23 @@ def main(level=None):
     # clear color
     bg = get_color('dark_grey')
     glClearColor(bg[0], bg[1], bg[2], 1)
+    hud_font.build()  # glyph display lists, once per context
 
     # start at title menu or jump straight into a requested level
     if level is not None:
-        setup_level(level)
+        setup_level(world, level)
         # enter gameplay directly
-        global paused, menu_mode
-        paused = False
-        menu_mode = None
+        world.paused = False
+        world.menu_mode = None
     else:
-        pause_game('title')
+        pause_game(world, 'title')
 
     glutMainLoop()
 
 if __name__ == "__main__":
+    if '--profile' in sys.argv:
+        # --profile [FRAMES]: capture the first frames after launch
+        i = sys.argv.index('--profile') + 1
+        start_profile(int(sys.argv[i]) if i < len(sys.argv) and sys.argv[i].isdigit() else None)
+    report_startup = '--startup' in sys.argv
     main()
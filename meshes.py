@@ -0,0 +1,56 @@
+"""
+Unit meshes as flat NumPy triangle lists for batched drawing in `main.py`.
+
+Each function returns an (n, 3) float32 array of triangle vertices laid out
+like the matching GLU/GLUT primitive (same slice angles and stack order), ready
+for glVertexPointer/glDrawArrays after scaling and translating on the CPU.
+"""
+
+import numpy as np
+
+
+def _grid_triangles(grid):
+    # (rows+1, cols+1, 3) vertex grid -> two triangles per cell
+    a = grid[:-1, :-1]; b = grid[1:, :-1]; c = grid[1:, 1:]; d = grid[:-1, 1:]
+    tris = np.stack([a, b, c, a, c, d], axis=2)
+    return np.ascontiguousarray(tris.reshape(-1, 3), dtype=np.float32)
+
+
+def sphere(slices, stacks):
+    # gluSphere(q, 1, slices, stacks): stacks run from +z to -z
+    theta = np.linspace(0.0, np.pi, stacks + 1)
+    phi = np.linspace(0.0, 2*np.pi, slices + 1)
+    st, ct = np.sin(theta)[:, None], np.cos(theta)[:, None]
+    grid = np.empty((stacks + 1, slices + 1, 3))
+    grid[..., 0] = st * np.sin(phi)[None, :]
+    grid[..., 1] = st * np.cos(phi)[None, :]
+    grid[..., 2] = ct
+    return _grid_triangles(grid)
+
+
+def cylinder(slices, stacks, top_ratio=1.0):
+    # gluCylinder(q, 1, top_ratio, 1, slices, stacks): open tube along +z
+    z = np.linspace(0.0, 1.0, stacks + 1)[:, None]
+    r = 1.0 + (top_ratio - 1.0) * z
+    phi = np.linspace(0.0, 2*np.pi, slices + 1)
+    grid = np.empty((stacks + 1, slices + 1, 3))
+    grid[..., 0] = r * np.sin(phi)[None, :]
+    grid[..., 1] = r * np.cos(phi)[None, :]
+    grid[..., 2] = z
+    return _grid_triangles(grid)
+
+
+def cube():
+    # glutSolidCube(1): unit cube centred on the origin
+    h = 0.5
+    quads = [
+        [(h, -h, -h), (h, h, -h), (h, h, h), (h, -h, h)],
+        [(-h, -h, -h), (-h, -h, h), (-h, h, h), (-h, h, -h)],
+        [(-h, h, -h), (-h, h, h), (h, h, h), (h, h, -h)],
+        [(-h, -h, -h), (h, -h, -h), (h, -h, h), (-h, -h, h)],
+        [(-h, -h, h), (h, -h, h), (h, h, h), (-h, h, h)],
+        [(-h, -h, -h), (-h, h, -h), (h, h, -h), (h, -h, -h)],
+    ]
+    q = np.array(quads, dtype=np.float32)
+    tris = np.concatenate([q[:, [0, 1, 2]], q[:, [0, 2, 3]]], axis=1)
+    return np.ascontiguousarray(tris.reshape(-1, 3))
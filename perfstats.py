@@ -0,0 +1,64 @@
+"""
+Frame-time history and per-frame counters for the performance overlay in
+`main.py`.
+
+FrameTimes keeps the simulation, render and whole-frame times of the last
+N frames in ring buffers, for the overlay's graph and FPS percentiles.
+Counters is a registry of named counts per frame. Game code adds to it at
+its existing loops, and the overlay shows the totals of the last completed
+frame. While the overlay is off, add() only tests a flag.
+"""
+
+import numpy as np
+
+
+class FrameTimes:
+    def __init__(self, size=240):
+        self.size = size
+        self.sim = np.zeros(size)     # ms spent in ticks
+        self.render = np.zeros(size)  # ms spent in display()
+        self.frame = np.zeros(size)   # ms since the previous frame
+        self.count = 0
+        self.next = 0
+
+    def add(self, sim_ms, render_ms, frame_ms):
+        i = self.next
+        self.sim[i] = sim_ms; self.render[i] = render_ms; self.frame[i] = frame_ms
+        self.next = (i + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def history(self):
+        # (sim, render, frame) arrays in ms, oldest frame first
+        order = (np.arange(self.count) + self.next - self.count) % self.size
+        return self.sim[order], self.render[order], self.frame[order]
+
+    def percentiles(self, ps=(50, 95, 99)):
+        # Frame time in ms at each percentile of the history
+        if not self.count:
+            return [0.0] * len(ps)
+        return np.percentile(self.history()[2], ps).tolist()
+
+
+class Counters:
+    def __init__(self, *names):
+        self.enabled = False
+        self.names = list(names)  # display order; new names are appended
+        self.current = {}         # counts of the frame in progress
+        self.last = {}            # counts of the last completed frame
+
+    def add(self, name, n=1):
+        if self.enabled:
+            self.current[name] = self.current.get(name, 0) + n
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        for name in self.current:
+            if name not in self.names:
+                self.names.append(name)
+        self.last = self.current
+        self.current = {}
+
+    def items(self):
+        # (name, count) for every registered counter, last frame's values
+        return [(name, self.last.get(name, 0)) for name in self.names]
@@ -0,0 +1,146 @@
+"""
+On-demand profiling captures for `main.py`.
+
+start(frames) records the next `frames` frames. While a capture runs,
+cProfile profiles the main thread, and the named phase scopes that main.py
+places around the stages of a tick and of display() are timed. When the
+last frame ends, two files are written to the output directory:
+`<name>.prof` is a cProfile dump for pstats or snakeviz, and
+`<name>.trace.json` is a Chrome trace, which chrome://tracing and
+ui.perfetto.dev can open.
+
+Scopes nest. scope(name) is a context manager. phase(name) starts a named
+stage and ends the previous phase of the same scope, so a long function can
+be split into stages without re-indenting it. Phases still open when their
+scope exits end with it. When no capture is running, both calls return
+immediately.
+"""
+
+import cProfile, contextlib, json, os, threading, time
+
+
+_capture = None  # the running Capture, or None
+_local = threading.local()  # per-thread stack of open scopes and phases
+_NULL = contextlib.nullcontext()
+
+
+class Capture:
+    def __init__(self, frames, out_dir, name):
+        self.frames_left = frames
+        self.out_dir = out_dir
+        self.name = name
+        self.events = []  # (name, thread id, start ns, duration ns)
+        self.threads = {threading.get_ident(): threading.current_thread().name}
+        self.frame = 0
+        self.frame_start = time.perf_counter_ns()
+        self.t0 = self.frame_start
+        self.profile = cProfile.Profile()
+
+    def record(self, name, start, end):
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        self.events.append((name, tid, start, end - start))
+
+    def trace(self):
+        # Chrome trace event format: complete ('X') events in microseconds
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                  for tid, name in self.threads.items()]
+        events += [{'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                    'ts': (start - self.t0) / 1e3, 'dur': dur / 1e3}
+                   for name, tid, start, dur in self.events]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, self.name)
+        self.profile.dump_stats(base + '.prof')
+        with open(base + '.trace.json', 'w') as f:
+            json.dump(self.trace(), f)
+        return base + '.prof', base + '.trace.json'
+
+
+def active():
+    return _capture is not None
+
+
+def start(frames=120, out_dir='profiles', name=None):
+    # Begin recording the next `frames` frames; ignored while a capture runs
+    global _capture
+    if _capture is not None:
+        return False
+    name = name or time.strftime('capture-%Y%m%d-%H%M%S')
+    _capture = Capture(frames, out_dir, name)
+    _capture.profile.enable()
+    return True
+
+
+def frame_end():
+    # Mark the end of a frame. After the last one, the capture stops and is
+    # saved; returns the (.prof, .trace.json) paths then, else None
+    global _capture
+    c = _capture
+    if c is None:
+        return None
+    now = time.perf_counter_ns()
+    c.record(f'frame {c.frame}', c.frame_start, now)
+    c.frame += 1
+    c.frame_start = now
+    c.frames_left -= 1
+    if c.frames_left > 0:
+        return None
+    c.profile.disable()
+    _capture = None
+    return c.save()
+
+
+def _stack():
+    s = getattr(_local, 'stack', None)
+    if s is None:
+        s = _local.stack = []
+    return s
+
+
+class _Scope:
+    __slots__ = ('name', 'depth')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        s = _stack()
+        self.depth = len(s)
+        s.append([self.name, time.perf_counter_ns(), False])
+        return self
+
+    def __exit__(self, *exc):
+        now = time.perf_counter_ns()
+        s = _stack()
+        c = _capture
+        # close phases left open inside this scope, then the scope itself
+        while len(s) > self.depth:
+            name, start, _ = s.pop()
+            if c is not None:
+                c.record(name, start, now)
+        return False
+
+
+def scope(name):
+    # Time the enclosed block as `name` while a capture runs
+    if _capture is None:
+        return _NULL
+    return _Scope(name)
+
+
+def phase(name):
+    # End the current phase of the enclosing scope, if any, and start `name`
+    c = _capture
+    if c is None:
+        return
+    s = _stack()
+    now = time.perf_counter_ns()
+    if s and s[-1][2]:
+        prev, start, _ = s.pop()
+        c.record(prev, start, now)
+    s.append([name, now, True])
@@ -0,0 +1,158 @@
+"""
+Array-backed projectile storage for `main.py`.
+
+Projectiles live in fixed-capacity NumPy arrays (one array per field) rather
+than one Python object per shot, so motion, expiry and hit tests run as
+vectorized passes. Dead slots go back on a free-list and are reused by later
+shots; `seq` keeps the firing order so hits can still resolve oldest-first.
+"""
+
+import numpy as np
+
+
+class ProjectilePool:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.x = np.zeros(capacity); self.y = np.zeros(capacity); self.z = np.zeros(capacity)
+        self.vx = np.zeros(capacity); self.vy = np.zeros(capacity)
+        # positions at the start of the tick, for render interpolation
+        self.prev_x = np.zeros(capacity); self.prev_y = np.zeros(capacity); self.prev_z = np.zeros(capacity)
+        self.seq = np.zeros(capacity, np.int64)
+        self.alive = np.zeros(capacity, bool)
+        self.free = list(range(capacity - 1, -1, -1))
+        self.count = 0
+        self.next_seq = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.alive[:] = False
+        self.vx[:] = 0; self.vy[:] = 0
+        self.free = list(range(self.capacity - 1, -1, -1))
+        self.count = 0
+
+    def _alloc(self, x, y, z, vx, vy):
+        # Claim a free slot; returns -1 (shot dropped) when the pool is full
+        if not self.free:
+            return -1
+        i = self.free.pop()
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.z[i] = self.prev_z[i] = z
+        self.vx[i] = vx; self.vy[i] = vy
+        self.seq[i] = self.next_seq; self.next_seq += 1
+        self.alive[i] = True
+        self.count += 1
+        return i
+
+    def live(self):
+        # Indices of live projectiles, oldest shot first
+        idx = np.flatnonzero(self.alive)
+        return idx[np.argsort(self.seq[idx], kind='stable')]
+
+    def kill(self, idx):
+        idx = np.asarray(idx, np.intp)
+        idx = idx[self.alive[idx]]
+        if idx.size == 0:
+            return
+        self.alive[idx] = False
+        # zero the velocity so dead slots stop drifting in integrate()
+        self.vx[idx] = 0; self.vy[idx] = 0
+        self.free.extend(idx.tolist())
+        self.count -= idx.size
+
+    def save_prev(self):
+        np.copyto(self.prev_x, self.x); np.copyto(self.prev_y, self.y); np.copyto(self.prev_z, self.z)
+
+    def integrate(self):
+        # Whole-array update; dead slots have zero velocity
+        self.x += self.vx; self.y += self.vy
+
+    def positions(self, idx, alpha=1.0):
+        # (n, 3) positions of idx interpolated between the previous and current tick
+        p = np.empty((idx.size, 3))
+        p[:, 0] = self.prev_x[idx] + (self.x[idx] - self.prev_x[idx]) * alpha
+        p[:, 1] = self.prev_y[idx] + (self.y[idx] - self.prev_y[idx]) * alpha
+        p[:, 2] = self.prev_z[idx] + (self.z[idx] - self.prev_z[idx]) * alpha
+        return p
+
+
+class BulletPool(ProjectilePool):
+    # Player bullets: expire after travelling max_dist
+    def __init__(self, capacity=1024):
+        super().__init__(capacity)
+        self.dmg = np.zeros(capacity)
+        self.dist = np.zeros(capacity)
+        self.max_dist = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+
+    def spawn(self, x, y, z, vx, vy, dmg, max_dist=800):
+        i = self._alloc(x, y, z, vx, vy)
+        if i >= 0:
+            self.dmg[i] = dmg
+            self.dist[i] = 0
+            self.max_dist[i] = max_dist
+            self.speed[i] = np.hypot(vx, vy)  # once per shot, not per tick
+        return i
+
+    def kill(self, idx):
+        idx = np.asarray(idx, np.intp)
+        self.speed[idx] = 0
+        super().kill(idx)
+
+    def clear(self):
+        super().clear()
+        self.speed[:] = 0
+
+    def update(self):
+        if not self.count:
+            return
+        self.integrate()
+        self.dist += self.speed
+        self.kill(np.flatnonzero(self.alive & (self.dist >= self.max_dist)))
+
+
+class EnemyShotPool(ProjectilePool):
+    # Enemy (boss/turret) shots: expire after `life` ticks, on leaving the
+    # arena, or when the enemy that fired them is removed (kill_owners)
+    def __init__(self, capacity=512):
+        super().__init__(capacity)
+        self.life = np.zeros(capacity, np.int64)
+        self.owner = np.zeros(capacity, np.int64)  # id() of the firing enemy, 0 = none
+
+    def spawn(self, x, y, z, vx, vy, life=2000, owner=None):
+        i = self._alloc(x, y, z, vx, vy)
+        if i >= 0:
+            self.life[i] = life
+            self.owner[i] = 0 if owner is None else id(owner)
+        return i
+
+    def kill_owners(self, enemies):
+        # Drop the live shots fired by any of these enemies
+        if not self.count:
+            return
+        ids = np.array([id(e) for e in enemies], np.int64)
+        self.kill(np.flatnonzero(self.alive & np.isin(self.owner, ids)))
+
+    def update(self, bounds=None):
+        # bounds: the level's world_bounds dict, or None for an open field
+        if not self.count:
+            return
+        self.integrate()
+        self.life -= 1
+        dead = self.alive & (self.life <= 0)
+        if bounds is not None:
+            dead |= self.alive & ((self.x < bounds['min_x']) | (self.x > bounds['max_x']) |
+                                  (self.y < bounds['min_y']) | (self.y > bounds['max_y']))
+        self.kill(np.flatnonzero(dead))
+
+    def hit_test(self, x, y, r):
+        # Remove every shot within r of (x, y) in the ground plane; returns how many
+        if not self.count:
+            return 0
+        idx = np.flatnonzero(self.alive)
+        dx = self.x[idx] - x; dy = self.y[idx] - y
+        hit = idx[dx*dx + dy*dy < r*r]
+        self.kill(hit)
+        return hit.size
@@ -0,0 +1,100 @@
+"""
+Uniform-grid spatial index for the dynamic entities in `main.py`.
+
+Items are bucketed by the world cell containing their (x, y) position, so
+radius and nearest-neighbour queries only visit the cells around the query
+point instead of every item in the level. Items are tracked by identity, which
+lets plain tuples (keys) and dicts (pickups) be indexed next to entities.
+"""
+
+import math
+
+
+class SpatialGrid:
+    def __init__(self, cell=200.0):
+        self.cell = float(cell)
+        self.cells = {}  # (cx, cy) -> {id(item): item}
+        self.items = {}  # id(item) -> [item, x, y, (cx, cy)]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return id(item) in self.items
+
+    def cell_of(self, x, y):
+        return (math.floor(x / self.cell), math.floor(y / self.cell))
+
+    def clear(self):
+        self.cells.clear()
+        self.items.clear()
+
+    def insert(self, item, x, y):
+        key = self.cell_of(x, y)
+        self.items[id(item)] = [item, x, y, key]
+        self.cells.setdefault(key, {})[id(item)] = item
+
+    def remove(self, item):
+        rec = self.items.pop(id(item), None)
+        if rec is None:
+            return
+        bucket = self.cells[rec[3]]
+        del bucket[id(item)]
+        if not bucket:
+            del self.cells[rec[3]]
+
+    def update(self, item, x, y):
+        # Called whenever an item moves; only re-buckets when it changes cell
+        rec = self.items.get(id(item))
+        if rec is None:
+            return
+        rec[1] = x; rec[2] = y
+        key = self.cell_of(x, y)
+        if key != rec[3]:
+            bucket = self.cells[rec[3]]
+            del bucket[id(item)]
+            if not bucket:
+                del self.cells[rec[3]]
+            self.cells.setdefault(key, {})[id(item)] = item
+            rec[3] = key
+
+    def _records_near(self, x, y, r):
+        # Records of every item in the cells overlapping the square around (x, y)
+        cx0, cy0 = self.cell_of(x - r, y - r)
+        cx1, cy1 = self.cell_of(x + r, y + r)
+        cells = self.cells; items = self.items
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    for key in bucket:
+                        yield items[key]
+
+    def query_radius(self, x, y, r):
+        # Items strictly closer than r to (x, y)
+        if not self.items:
+            return []
+        r2 = r*r
+        found = []
+        for rec in self._records_near(x, y, r):
+            dx = rec[1] - x; dy = rec[2] - y
+            if dx*dx + dy*dy < r2:
+                found.append(rec[0])
+        return found
+
+    def points_near(self, x, y, r):
+        # (x, y) of the items in the cells around (x, y) without the distance
+        # test, for callers that filter a whole batch at once
+        if not self.items:
+            return []
+        return [(rec[1], rec[2]) for rec in self._records_near(x, y, r)]
+
+    def nearest(self, x, y, r):
+        # Closest item strictly within r of (x, y), or None
+        best = None; best_d2 = r*r
+        for item in self.query_radius(x, y, r):
+            rec = self.items[id(item)]
+            d2 = (rec[1] - x)**2 + (rec[2] - y)**2
+            if d2 < best_d2:
+                best, best_d2 = item, d2
+        return best
@@ -0,0 +1,96 @@
+"""
+Draw-call budget check for the single-file prototype in `main.py`.
+
+Plays each level from a fixed seed and, every few ticks, renders one frame
+per camera mode with every GL call replaced by a counted no-op (glcount.py),
+so it runs without a window, GL context or GPU. A frame that makes more GL
+calls than its level's budget, or more calls to one of the capped functions,
+fails the check and the script exits with status 1.
+
+The first frame of a level compiles the static layer and HUD widgets and is
+not checked. Later frames reuse the static layer; only a HUD widget whose
+values changed (ammo after a shot, say) is re-baked, so glNewList is capped
+at two. Rebuilding the static layer takes dozens. Budgets have some
+headroom over the counts of the current renderer; lower them when a
+render-path change brings the counts down.
+
+Usage: python test_budgets.py [level ...] [--frames N] [--ticks N]
+"""
+
+import argparse, sys
+
+import font
+import main as game
+from glcount import GLCounter
+
+
+SEED = 1
+
+# level -> GL calls allowed in one steady-state frame
+BUDGETS = {1: 300, 2: 300, 3: 450}
+
+# function -> calls allowed in one steady-state frame, on every level
+CAPS = {
+    'glNewList': 2,     # HUD re-bakes only; the static layer is compiled once
+    'glVertex3f': 0,    # world geometry is in display lists or arrays
+    'glBegin': 4,
+    'gluSphere': 4,
+    'gluCylinder': 40,
+    'glutSolidCube': 40,
+}
+
+MODES = (('third', game.cam_third), ('first', game.cam_first), ('topdown', game.cam_topdown))
+
+
+def walk(i):
+    # Same input script as bench.py: walk, turn now and then, fire
+    return {'w': i % 120 < 90, 'd': i % 240 >= 200, 'fire': i % 15 == 0}
+
+
+def check_level(level, frames, ticks):
+    # Returns the list of budget failures of `frames` sampled frames per mode
+    w = game.World(SEED)
+    game.setup_level(w, level)
+    w.paused = False; w.menu_mode = None
+    w.player.health = 10**9
+    failures = []
+    worst = {name: 0 for name, _ in MODES}
+    with GLCounter(game, font) as gl:
+        game.display(w); gl.reset()  # warm-up frame compiles the cached layers
+        t = 0
+        for frame in range(frames):
+            t += game.step(w, ticks, lambda i: walk(t + i))
+            for name, mode in MODES:
+                game.camera_mode = mode; game.cam_eye = None; game.cam_cen = None
+                game.display(w)
+                counts = gl.end_frame()
+                total = gl.total(counts)
+                worst[name] = max(worst[name], total)
+                where = f"level {level} {name} tick {t}"
+                if total > BUDGETS[level]:
+                    failures.append(f"{where}: {total} GL calls, budget {BUDGETS[level]}")
+                for fn, cap in CAPS.items():
+                    if counts[fn] > cap:
+                        failures.append(f"{where}: {counts[fn]} {fn} calls, cap {cap}")
+    print(f"level {level}  budget {BUDGETS[level]:4d}  worst " +
+          "  ".join(f"{name} {n:4d}" for name, n in worst.items()))
+    return failures
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Check per-frame GL call budgets of each level")
+    ap.add_argument('levels', nargs='*', type=int, default=sorted(BUDGETS))
+    ap.add_argument('--frames', type=int, default=10, help="frames checked per level and camera mode")
+    ap.add_argument('--ticks', type=int, default=30, help="ticks played between checked frames")
+    args = ap.parse_args()
+
+    game.preload_enabled = False
+    game.bind_gl()
+    failures = []
+    for level in args.levels:
+        failures += check_level(level, args.frames, args.ticks)
+    for msg in failures:
+        print(f"OVER BUDGET {msg}", file=sys.stderr)
+    if not failures:
+        print("All frames within budget")
+    sys.exit(1 if failures else 0)
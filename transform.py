@@ -0,0 +1,57 @@
+"""
+Small 4x4 transform helpers for the entity hierarchy in `main.py`.
+
+Matrices are flat 16-tuples in OpenGL column-major order, ready for
+glMultMatrixf. They are built the way the old per-primitive calls composed
+them (translate, glRotatef about x, then y, then z, then scale), in plain
+Python since the matrices are too small for NumPy to pay off.
+"""
+
+import math
+
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0,
+            0.0, 1.0, 0.0, 0.0,
+            0.0, 0.0, 1.0, 0.0,
+            0.0, 0.0, 0.0, 1.0)
+
+
+def rotation(rx, ry, rz):
+    # Rx(rx) * Ry(ry) * Rz(rz) as three rows
+    if not (rx or ry or rz):
+        return ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+    a, b, c = math.radians(rx), math.radians(ry), math.radians(rz)
+    ca, sa = math.cos(a), math.sin(a)
+    cb, sb = math.cos(b), math.sin(b)
+    cc, sc = math.cos(c), math.sin(c)
+    return ((cb*cc, -cb*sc, sb),
+            (sa*sb*cc + ca*sc, -sa*sb*sc + ca*cc, -sa*cb),
+            (-ca*sb*cc + sa*sc, ca*sb*sc + sa*cc, ca*cb))
+
+
+def trs(tx, ty, tz, rx=0, ry=0, rz=0, sx=1.0, sy=1.0, sz=1.0, oz=0.0):
+    # translate(t) * rotate(rx, ry, rz) * scale(s) * translate(0, 0, oz)
+    r = rotation(rx, ry, rz)
+    m = [[r[i][0]*sx, r[i][1]*sy, r[i][2]*sz] for i in range(3)]
+    t = (tx + m[0][2]*oz, ty + m[1][2]*oz, tz + m[2][2]*oz)
+    return (m[0][0], m[1][0], m[2][0], 0.0,
+            m[0][1], m[1][1], m[2][1], 0.0,
+            m[0][2], m[1][2], m[2][2], 0.0,
+            t[0], t[1], t[2], 1.0)
+
+
+def apply(m, x, y, z):
+    # Transform a point
+    return (m[0]*x + m[4]*y + m[8]*z + m[12],
+            m[1]*x + m[5]*y + m[9]*z + m[13],
+            m[2]*x + m[6]*y + m[10]*z + m[14])
+
+
+def apply_box(m, x0, y0, z0, x1, y1, z1):
+    # Axis-aligned box enclosing the transformed box (x0..x1, y0..y1, z0..z1)
+    cx, cy, cz = apply(m, (x0+x1)/2, (y0+y1)/2, (z0+z1)/2)
+    hx, hy, hz = (x1-x0)/2, (y1-y0)/2, (z1-z0)/2
+    ex = abs(m[0])*hx + abs(m[4])*hy + abs(m[8])*hz
+    ey = abs(m[1])*hx + abs(m[5])*hy + abs(m[9])*hz
+    ez = abs(m[2])*hx + abs(m[6])*hy + abs(m[10])*hz
+    return (cx-ex, cy-ey, cz-ez, cx+ex, cy+ey, cz+ez)